@@ -6,16 +6,16 @@ import uuid
 from typing import List, Tuple
 
 from langchain_core.tools import tool
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.constants import START
 from langgraph.graph import StateGraph
-from langgraph.graph.ui import push_ui_message
 
 from giga_agent.agents.gis_agent.config import MapState
 from giga_agent.agents.gis_agent.nodes.attractions import attractions_node
+from giga_agent.agents.gis_agent.nodes.enrich import enrich_node
 from giga_agent.agents.gis_agent.nodes.food import food_node
 from giga_agent.agents.gis_agent.nodes.hotels import hotels_node
 from giga_agent.agents.gis_agent.utils.gis_client import Location, Attraction, Point
+from giga_agent.utils.subagents import run_subagent
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
@@ -50,21 +50,17 @@ workflow = StateGraph(MapState)
 workflow.add_node("attractions_node", attractions_node)
 workflow.add_node("hotels_node", hotels_node)
 workflow.add_node("food_node", food_node)
+workflow.add_node("enrich_node", enrich_node)
 
 workflow.add_edge(START, "attractions_node")
 workflow.add_edge("attractions_node", "hotels_node")
 workflow.add_edge("hotels_node", "food_node")
-workflow.add_edge("food_node", "__end__")
+workflow.add_edge("food_node", "enrich_node")
+workflow.add_edge("enrich_node", "__end__")
 
 
 def get_bbox(points: List[Point]) -> dict:
-    # преобразуем строки в числа
-    lats = [float(p["lat"]) for p in points]
-    lons = [float(p["lon"]) for p in points]
-
-    # минимальная и максимальная широта/долгота
-    min_lat, max_lat = min(lats), max(lats)
-    min_lon, max_lon = min(lons), max(lons)
+    min_lat, max_lat, min_lon, max_lon = get_bounds(points)
 
     # в формате [lon, lat]
     southWest = [min_lon, min_lat]
@@ -73,8 +69,7 @@ def get_bbox(points: List[Point]) -> dict:
     return {"southWest": southWest, "northEast": northEast}
 
 
-memory = MemorySaver()
-graph = workflow.compile(checkpointer=memory)
+graph = workflow.compile()
 
 
 @tool
@@ -86,26 +81,19 @@ async def city_explore(city: str):
     Args:
         city: Полное название города
     """
-    conf = {
-        "configurable": {
-            "thread_id": str(uuid.uuid4()),
-            "skip_search": False if os.getenv("TAVILY_API_KEY") else True,
-        }
-    }
-    push_ui_message(
-        "agent_execution",
-        {"agent": "city_explore", "node": "__start__"},
+    # Граф нужен только на время вызова: выполняем в процессе без чекпоинтов
+    state = await run_subagent(
+        "city_explore",
+        "city_explore",
+        graph,
+        {"city_name": city},
+        config={
+            "configurable": {
+                "skip_search": False if os.getenv("TAVILY_API_KEY") else True,
+            }
+        },
+        mode="local",
     )
-    input_ = {"city_name": city}
-    async for event in graph.astream(
-        input_,
-        config=conf,
-    ):
-        push_ui_message(
-            "agent_execution",
-            {"agent": "city_explore", "node": list(event.keys())[0]},
-        )
-    state = graph.get_state(config=conf).values
     hotels_message = []
     food_message = []
     attractions_message = []
@@ -194,13 +182,16 @@ def attraction_to_string(attraction: Attraction):
 
 
 async def main():
-    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
-    async for event in graph.astream(
+    state = {}
+    async for mode, chunk in graph.astream(
         {"city_name": "Москва"},
-        config=config,
+        config={"configurable": {}},
+        stream_mode=["updates", "values"],
     ):
-        print(event)
-    state = graph.get_state(config=config).values
+        if mode == "values":
+            state = chunk
+        else:
+            print(chunk)
     hotels_message = []
     food_message = []
     attractions_message = []
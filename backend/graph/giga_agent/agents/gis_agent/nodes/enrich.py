@@ -0,0 +1,14 @@
+from langchain_core.runnables import RunnableConfig
+
+from giga_agent.agents.gis_agent.config import MapState
+from giga_agent.agents.gis_agent.utils.gis_client import enrich_locations
+
+
+async def enrich_node(state: MapState, config: RunnableConfig):
+    """Дополняет описания отелей и кафе одним пакетом поисковых запросов."""
+    if config["configurable"].get("skip_search", False):
+        return {}
+    hotels = [dict(location) for location in state["hotels"]]
+    food = [dict(location) for location in state["food"]]
+    await enrich_locations(hotels + food, state["city_name"])
+    return {"hotels": hotels, "food": food}
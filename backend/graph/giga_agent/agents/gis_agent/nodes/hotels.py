@@ -1,13 +1,9 @@
-import asyncio
 import random
 
 from langchain_core.runnables import RunnableConfig
 
 from giga_agent.agents.gis_agent.config import MapState
-from giga_agent.agents.gis_agent.utils.gis_client import (
-    fetch_branches,
-    location_to_description,
-)
+from giga_agent.agents.gis_agent.utils.gis_client import fetch_branches
 
 
 async def hotels_node(state: MapState, config: RunnableConfig):
@@ -16,11 +12,4 @@ async def hotels_node(state: MapState, config: RunnableConfig):
         branches = random.sample(branches, 3)
     except ValueError:
         pass
-    if not config["configurable"].get("skip_search", False):
-        tasks = []
-        for branch in branches:
-            tasks.append(location_to_description(branch, state["city_name"]))
-        results = await asyncio.gather(*tasks)
-        for branch, result in zip(branches, results):
-            branch["description"] = result
     return {"hotels": branches}
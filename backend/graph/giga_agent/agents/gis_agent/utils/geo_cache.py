@@ -0,0 +1,275 @@
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Путь к SQLite-файлу кэша, пустое значение выключает кэш
+GIS_CACHE_PATH = os.getenv("GIS_CACHE_PATH", "cache/gis.sqlite3")
+GIS_CITY_CACHE_TTL_DAYS = float(os.getenv("GIS_CITY_CACHE_TTL_DAYS", 30))
+GIS_PLACES_CACHE_TTL_HOURS = float(os.getenv("GIS_PLACES_CACHE_TTL_HOURS", 24))
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = 111320
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    name TEXT PRIMARY KEY, lat REAL, lon REAL, updated REAL
+);
+CREATE TABLE IF NOT EXISTS searches (
+    kind TEXT, lat REAL, lon REAL, radius REAL, updated REAL
+);
+CREATE INDEX IF NOT EXISTS searches_kind ON searches (kind, updated);
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY,
+    kind TEXT,
+    place_id TEXT,
+    rank INTEGER,
+    lat REAL,
+    lon REAL,
+    data TEXT,
+    updated REAL,
+    UNIQUE (kind, place_id)
+);
+CREATE INDEX IF NOT EXISTS places_kind_lat_lon ON places (kind, lat, lon);
+"""
+RTREE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree
+USING rtree (id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние между точками по формуле гаверсинусов, в метрах."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def radius_bbox(
+    lat: float, lon: float, radius: float
+) -> Tuple[float, float, float, float]:
+    """Ограничивающий прямоугольник круга: (min_lat, max_lat, min_lon, max_lon)."""
+    d_lat = radius / METERS_PER_DEGREE
+    d_lon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon
+
+
+def normalize_city(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class GeoCache:
+    """Локальный кэш ответов 2GIS в SQLite.
+
+    - Координаты городов по нормализованному названию.
+    - Списки мест по категории (`kind`) с R-tree индексом по координатам.
+      Поиск в радиусе отдается из кэша, если его круг целиком покрыт
+      свежим поиском той же категории.
+    Если SQLite собран без R-tree, используется обычный индекс (kind, lat, lon).
+    """
+
+    def __init__(self, path: str, city_ttl: float, places_ttl: float) -> None:
+        self.path = path
+        self.city_ttl = city_ttl
+        self.places_ttl = places_ttl
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._rtree = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(RTREE_SCHEMA)
+                self._rtree = True
+            except sqlite3.OperationalError:
+                self._rtree = False
+            self._initialized = True
+        return conn
+
+    def _run(self, func, *args):
+        """Выполняет запрос под локом; ошибки кэша не должны ронять агента."""
+        with self._lock:
+            try:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                conn = self._connect()
+            except (OSError, sqlite3.Error):
+                return None
+            try:
+                with conn:
+                    return func(conn, *args)
+            except sqlite3.Error:
+                return None
+            finally:
+                conn.close()
+
+    def get_city(self, name: str) -> Optional[dict]:
+        def query(conn):
+            row = conn.execute(
+                "SELECT lat, lon FROM cities WHERE name = ? AND updated >= ?",
+                (normalize_city(name), time.time() - self.city_ttl),
+            ).fetchone()
+            return {"lat": row[0], "lon": row[1]} if row else None
+
+        return self._run(query)
+
+    def set_city(self, name: str, point: dict) -> None:
+        def query(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO cities VALUES (?, ?, ?, ?)",
+                (
+                    normalize_city(name),
+                    float(point["lat"]),
+                    float(point["lon"]),
+                    time.time(),
+                ),
+            )
+
+        self._run(query)
+
+    def get_places(
+        self, kind: str, point: dict, radius: float, limit: int
+    ) -> Optional[List[dict]]:
+        """Места категории в радиусе от точки в порядке ранга из ответа 2GIS.
+
+        None — кэш не покрывает этот круг и нужен запрос к API.
+        """
+        lat, lon = float(point["lat"]), float(point["lon"])
+
+        def query(conn):
+            fresh = time.time() - self.places_ttl
+            searches = conn.execute(
+                "SELECT lat, lon, radius FROM searches WHERE kind = ? AND updated >= ?",
+                (kind, fresh),
+            ).fetchall()
+            if not any(
+                distance_m(lat, lon, s_lat, s_lon) + radius <= s_radius
+                for s_lat, s_lon, s_radius in searches
+            ):
+                return None
+            min_lat, max_lat, min_lon, max_lon = radius_bbox(lat, lon, radius)
+            if self._rtree:
+                rows = conn.execute(
+                    "SELECT p.lat, p.lon, p.data FROM places_rtree r "
+                    "JOIN places p ON p.id = r.id "
+                    "WHERE r.min_lat >= ? AND r.max_lat <= ? "
+                    "AND r.min_lon >= ? AND r.max_lon <= ? "
+                    "AND p.kind = ? AND p.updated >= ? ORDER BY p.rank",
+                    (min_lat, max_lat, min_lon, max_lon, kind, fresh),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT lat, lon, data FROM places "
+                    "WHERE kind = ? AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ? "
+                    "AND updated >= ? ORDER BY rank",
+                    (kind, min_lat, max_lat, min_lon, max_lon, fresh),
+                ).fetchall()
+            places = [
+                json.loads(data)
+                for p_lat, p_lon, data in rows
+                if distance_m(lat, lon, p_lat, p_lon) <= radius
+            ]
+            return places[:limit]
+
+        return self._run(query)
+
+    def set_places(
+        self, kind: str, point: dict, radius: float, places: List[dict]
+    ) -> None:
+        """Сохраняет результат поиска в радиусе и удаляет устаревшие записи."""
+        lat, lon = float(point["lat"]), float(point["lon"])
+
+        def query(conn):
+            now = time.time()
+            self._prune(conn, now - self.places_ttl)
+            for rank, place in enumerate(places):
+                p_lat = float(place["point"]["lat"])
+                p_lon = float(place["point"]["lon"])
+                conn.execute(
+                    "INSERT INTO places "
+                    "(kind, place_id, rank, lat, lon, data, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (kind, place_id) DO UPDATE SET "
+                    "rank = excluded.rank, lat = excluded.lat, lon = excluded.lon, "
+                    "data = excluded.data, updated = excluded.updated",
+                    (
+                        kind,
+                        place["id"],
+                        rank,
+                        p_lat,
+                        p_lon,
+                        json.dumps(place, ensure_ascii=False),
+                        now,
+                    ),
+                )
+                if self._rtree:
+                    row_id = conn.execute(
+                        "SELECT id FROM places WHERE kind = ? AND place_id = ?",
+                        (kind, place["id"]),
+                    ).fetchone()[0]
+                    conn.execute(
+                        "INSERT OR REPLACE INTO places_rtree VALUES (?, ?, ?, ?, ?)",
+                        (row_id, p_lat, p_lat, p_lon, p_lon),
+                    )
+            conn.execute(
+                "INSERT INTO searches VALUES (?, ?, ?, ?, ?)",
+                (kind, lat, lon, radius, now),
+            )
+
+        self._run(query)
+
+    def _prune(self, conn: sqlite3.Connection, expired: float) -> None:
+        conn.execute("DELETE FROM searches WHERE updated < ?", (expired,))
+        if self._rtree:
+            conn.execute(
+                "DELETE FROM places_rtree WHERE id IN "
+                "(SELECT id FROM places WHERE updated < ?)",
+                (expired,),
+            )
+        conn.execute("DELETE FROM places WHERE updated < ?", (expired,))
+
+    async def aget_city(self, name: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.get_city, name)
+
+    async def aset_city(self, name: str, point: dict) -> None:
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.set_city, name, point)
+
+    async def aget_places(
+        self, kind: str, point: dict, radius: float, limit: int
+    ) -> Optional[List[dict]]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.get_places, kind, point, radius, limit)
+
+    async def aset_places(
+        self, kind: str, point: dict, radius: float, places: List[dict]
+    ) -> None:
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.set_places, kind, point, radius, places)
+
+
+geo_cache = GeoCache(
+    GIS_CACHE_PATH,
+    city_ttl=GIS_CITY_CACHE_TTL_DAYS * 24 * 3600,
+    places_ttl=GIS_PLACES_CACHE_TTL_HOURS * 3600,
+)
@@ -2,10 +2,19 @@ import json
 import os
 import asyncio
 import httpx
-from typing import TypedDict, Optional, List
+from typing import Dict, TypedDict, Optional, List
 from langchain_tavily import TavilySearch
 from markdownify import markdownify as md
 
+from giga_agent.agents.gis_agent.utils.geo_cache import geo_cache
+
+# Сколько описаний мест (по id 2GIS) хранить в памяти процесса
+GIS_DESCRIPTION_CACHE_SIZE = int(os.getenv("GIS_DESCRIPTION_CACHE_SIZE", 1024))
+# Сколько поисковых запросов обогащения выполнять одновременно
+GIS_SEARCH_PARALLEL = int(os.getenv("GIS_SEARCH_PARALLEL", 4))
+
+_DESCRIPTION_CACHE: Dict[str, str] = {}
+
 
 class GISException(Exception):
     pass
@@ -25,6 +34,7 @@ class Location(TypedDict):
     photos: List[str]
     point: Point
     description: str
+    phone: Optional[str]
 
 
 class Attraction(TypedDict):
@@ -36,6 +46,9 @@ class Attraction(TypedDict):
 
 
 async def fetch_city_cords(city_name: str) -> Point:
+    cached = await geo_cache.aget_city(city_name)
+    if cached is not None:
+        return cached
     url = "https://catalog.api.2gis.com/3.0/items"
     params = {
         "q": city_name.strip(),
@@ -59,21 +72,30 @@ async def fetch_city_cords(city_name: str) -> Point:
                 raise GISException(
                     json.dumps(data["meta"]["error"], ensure_ascii=False)
                 )
-        return data["result"]["items"][0]["point"]
+        point = data["result"]["items"][0]["point"]
+    await geo_cache.aset_city(city_name, point)
+    return point
 
 
 async def fetch_branches(q: str, point: Point, district_id=None):
+    kind = f"branch:{q}"
+    radius = 4000
+    page_size = 20
+    if district_id is None:
+        cached = await geo_cache.aget_places(kind, point, radius, page_size)
+        if cached is not None:
+            return cached
     url = "https://catalog.api.2gis.com/3.0/items"
     params = {
         "q": q,
         "type": "branch",
-        "page_size": 20,
-        "radius": 4000,
+        "page_size": page_size,
+        "radius": radius,
         "search_nearby": True,
         "page": 1,
         "sort": "rating",
         "key": os.environ["TWOGIS_TOKEN"],
-        "fields": "items.context,items.rubrics,items.external_content,items.attribute_groups,items.point",
+        "fields": "items.context,items.rubrics,items.external_content,items.attribute_groups,items.point,items.contact_groups,items.ads,items.schedule",
         "location": f'{point["lon"]},{point["lat"]}',
         "point": f'{point["lon"]},{point["lat"]}',
     }
@@ -122,20 +144,29 @@ async def fetch_branches(q: str, point: Point, district_id=None):
                     "icon": icon_url,
                     "photos": photos,
                     "point": item["point"],
-                    "description": "",
+                    "description": item_description(item),
+                    "phone": item_phone(item),
                 }
             )
             names.append(item["name"])
+    if district_id is None:
+        await geo_cache.aset_places(kind, point, radius, result_items)
     return result_items
 
 
 async def fetch_attractions(point: Point):
+    kind = "attraction:достопримечательности"
+    radius = 3000
+    page_size = 15
+    cached = await geo_cache.aget_places(kind, point, radius, page_size)
+    if cached is not None:
+        return cached
     url = "https://catalog.api.2gis.com/3.0/items"
     params = {
         "q": "достопримечательности",
         "type": "attraction",
-        "page_size": 15,
-        "radius": 3000,
+        "page_size": page_size,
+        "radius": radius,
         "sort": "rating",
         "page": 1,
         "key": os.environ["TWOGIS_TOKEN"],
@@ -175,17 +206,83 @@ async def fetch_attractions(point: Point):
                     "description": md(item["description"]) + since,
                 }
             )
+    await geo_cache.aset_places(kind, point, radius, result_items)
     return result_items
 
 
-async def location_to_description(location: Location, city: str) -> Optional[str]:
+def item_phone(item: dict) -> Optional[str]:
+    """Первый телефон организации из `contact_groups` ответа 2GIS."""
+    for group in item.get("contact_groups", []):
+        for contact in group.get("contacts", []):
+            if contact.get("type") == "phone":
+                return contact.get("text") or contact.get("value")
+    return None
+
+
+def item_description(item: dict) -> str:
+    """Описание организации из ответа 2GIS: рекламный текст, телефон и
+    часы работы. Пустая строка, если телефона в ответе нет."""
+    phone = item_phone(item)
+    if not phone:
+        return ""
+    parts = []
+    ads = item.get("ads") or {}
+    text = ads.get("article") or ads.get("text")
+    if text:
+        parts.append(md(text).strip())
+    parts.append(f"Телефон: {phone}")
+    schedule = item.get("schedule") or {}
+    if schedule.get("is_24x7"):
+        parts.append("Работает круглосуточно")
+    return "\n".join(parts)
+
+
+def cache_description(location_id: str, description: str) -> None:
+    if GIS_DESCRIPTION_CACHE_SIZE <= 0:
+        return
+    _DESCRIPTION_CACHE.pop(location_id, None)
+    _DESCRIPTION_CACHE[location_id] = description
+    while len(_DESCRIPTION_CACHE) > GIS_DESCRIPTION_CACHE_SIZE:
+        # dict сохраняет порядок вставки: первым удаляется самое старое
+        _DESCRIPTION_CACHE.pop(next(iter(_DESCRIPTION_CACHE)))
+
+
+def location_query(location: Location, city: str) -> str:
+    return f'{location["name"]} номер телефона; {city}, {location["address"]}'
+
+
+async def enrich_locations(locations: List[Location], city: str) -> None:
+    """Заполняет `description` мест, для которых 2GIS не вернул телефон.
+
+    Описания берутся из кэша по id 2GIS, иначе ищутся одним пакетом
+    запросов Tavily; одинаковые запросы выполняются один раз.
+    """
+    queries: Dict[str, List[Location]] = {}
+    for location in locations:
+        if location.get("description"):
+            continue
+        cached = _DESCRIPTION_CACHE.get(location["id"])
+        if cached is not None:
+            location["description"] = cached
+            continue
+        queries.setdefault(location_query(location, city), []).append(location)
+    if not queries:
+        return
+
     search = TavilySearch(include_answer="advanced")
-    result = await search.ainvoke(
-        {
-            "query": f'{location["name"]} номер телефона; {city}, {location["address"]}',
-        }
+    results = await search.abatch(
+        [{"query": query} for query in queries],
+        config={"max_concurrency": GIS_SEARCH_PARALLEL},
+        return_exceptions=True,
     )
-    return result["answer"]
+    for same_query, result in zip(queries.values(), results):
+        if isinstance(result, Exception) or not isinstance(result, dict):
+            continue
+        description = result.get("answer") or ""
+        for location in same_query:
+            location["description"] = description
+            if description:
+                cache_description(location["id"], description)
 
 
 if __name__ == "__main__":
@@ -196,6 +293,7 @@ if __name__ == "__main__":
         print(cords)
         # branches = await fetch_branches("поесть", cords)
         # attractions = await fetch_attractions(cords)
-        # print(await location_to_description(branches[0], city))
+        # await enrich_locations(branches, city)
+        # print(branches[0]["description"])
 
     asyncio.run(main())
@@ -26,6 +26,7 @@ from giga_agent.agents.landing_agent.tools import plan, image, coder, done
 from giga_agent.agents.landing_agent.prompts.ru import AGENT_PROMPT
 from giga_agent.utils.lang import LANG
 from giga_agent.utils.env import load_project_env
+from giga_agent.utils.images import embed_images
 from giga_agent.utils.messages import filter_tool_messages
 
 load_project_env()
@@ -180,14 +181,17 @@ async def create_landing(
                                 "node": message["tool_calls"][0]["name"],
                             },
                         )
-    code = result_state["html"]
-    for name, value in result_state.get("images_base_64", {}).items():
-        code = code.replace(name, f"data:image/jpeg;base64, {value}")
+    code, images = await embed_images(
+        result_state["html"],
+        result_state.get("images_base_64", {}),
+        {i["name"]: i.get("width") for i in result_state.get("images", [])},
+    )
     file_id = str(uuid.uuid4())
     return {
         "text": result_state.get("done", "Страница готова"),
         "message": f'В результате выполнения была сгенерирована HTML страница {file_id}. Покажи её пользователю через "![HTML-страница](html:{file_id})" и напиши ответ с использованием информации из `text` и куда двигаться пользователю дальше\nТекущий thread_id: "{thread_id}" используй его, если пользователю нужно будет продолжить работу над страницей. Ни в коем случае не пиши thread_id пользователю — он нужен только для параметра thread_id!',
         "giga_attachments": [{"type": "text/html", "file_id": file_id, "data": code}],
+        "giga_images": images,
         "thread_id": thread_id,
     }
 
@@ -1,4 +1,3 @@
-import asyncio
 import json
 import uuid
 
@@ -14,7 +13,7 @@ from langchain_core.runnables import (
 from giga_agent.agents.landing_agent.config import llm, LandingState
 from giga_agent.agents.landing_agent.prompts.ru import IMAGE_PROMPT
 from giga_agent.utils.lang import LANG
-from giga_agent.generators.image import load_image_gen
+from giga_agent.generators.image import load_image_gen, PRIORITY_LOW
 from giga_agent.utils.env import load_project_env
 
 
@@ -84,11 +83,10 @@ async def image_node(state: LandingState, config: RunnableConfig):
         filtered_images.append(image)
     generator = load_image_gen()
     await generator.init()
-    tasks = [
-        generator.generate_image(i["description"], i["width"], i["height"])
-        for i in filtered_images
-    ]
-    images_data = await asyncio.gather(*tasks, return_exceptions=True)
+    images_data = await generator.generate_images(
+        [(i["description"], i["width"], i["height"]) for i in filtered_images],
+        priority=PRIORITY_LOW,
+    )
     images_base_64 = state.get("images_base_64", {})
     new_images = []
     for i, b in zip(filtered_images, images_data):
@@ -1,17 +1,17 @@
 import os
+from typing import Iterable, Optional, Tuple
 
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import tool
 from langgraph.graph import END, START, StateGraph
-from langgraph.graph.ui import push_ui_message
 from langgraph.types import interrupt
-from langgraph_sdk import get_client
 from typing_extensions import Annotated, TypedDict
 
 from giga_agent.utils.lang import LANG
 from giga_agent.utils.llm import load_llm
+from giga_agent.utils.subagents import run_subagent
 
 llm = load_llm().with_config(tags=["nostream"])
 
@@ -45,12 +45,44 @@ class LeanGraphState(TypedDict):
     revenue_streams: Annotated[str, "Как бизнес будет зарабатывать деньги."]
 
 
-def state_to_string(state: LeanGraphState) -> str:
+# Разделы ядра заполняются последовательно, каждый опирается на предыдущие
+CORE_SECTIONS = (
+    "customer_segments",
+    "problem",
+    "unique_value_proposition",
+    "solution",
+)
+
+# От каких разделов зависит раздел: только они попадают в его промпт.
+# Разделы, зависящие лишь от ядра, генерируются параллельно после 4_solution
+SECTION_DEPENDENCIES = {
+    "customer_segments": (),
+    "problem": ("customer_segments",),
+    "unique_value_proposition": ("customer_segments", "problem"),
+    "solution": ("customer_segments", "problem", "unique_value_proposition"),
+    "channels": ("customer_segments", "unique_value_proposition"),
+    "revenue_streams": CORE_SECTIONS,
+    "cost_structure": ("problem", "solution"),
+    "key_metrics": CORE_SECTIONS,
+    "unfair_advantage": ("unique_value_proposition", "solution"),
+}
+
+# Поля, которые нужны в промпте любого раздела
+CONTEXT_FIELDS = ("main_task", "competitors_analysis", "feedback")
+
+
+def state_to_string(
+    state: LeanGraphState, fields: Optional[Iterable[str]] = None
+) -> str:
     """
     Преобразует состояние в строку для отображения.
+    Если заданы `fields`, выводятся только они.
     """
+    fields = set(fields) if fields is not None else None
     result = []
     for field, annotation in LeanGraphState.__annotations__.items():
+        if fields is not None and field not in fields:
+            continue
         value = state.get(field, "")
         if value:
             # annotation is typing.Annotated[type, description]
@@ -62,7 +94,18 @@ def state_to_string(state: LeanGraphState) -> str:
     return "\n".join(result)
 
 
-async def ask_llm(state: LeanGraphState, question: str, config: RunnableConfig) -> str:
+def section_fields(section: str) -> Tuple[str, ...]:
+    """Поля состояния для промпта раздела: контекст, зависимости и
+    прошлая версия самого раздела (для доработки по фидбеку)."""
+    return CONTEXT_FIELDS + SECTION_DEPENDENCIES[section] + (section,)
+
+
+async def ask_llm(
+    state: LeanGraphState,
+    question: str,
+    config: RunnableConfig,
+    section: Optional[str] = None,
+) -> str:
     TEMPLATE = """
     Ты - эксперт в области стартапов и Lean Canvas. Твоя задача - помочь пользователю создать Lean Canvas для его задачи.
     Учитывай уже заполненные части таблицы Lean Canvas и главную задачу пользователя (main_task).
@@ -86,23 +129,33 @@ async def ask_llm(state: LeanGraphState, question: str, config: RunnableConfig)
     )
 
     chain = prompt | llm | StrOutputParser()
-    return await chain.ainvoke({"state": state_to_string(state), "question": question})
+    fields = section_fields(section) if section else None
+    return await chain.ainvoke(
+        {"state": state_to_string(state, fields), "question": question}
+    )
 
 
 async def customer_segments(state: LeanGraphState, config: RunnableConfig):
     return {
-        "customer_segments": await ask_llm(state, "Кто ваши целевые клиенты?", config)
+        "customer_segments": await ask_llm(
+            state, "Кто ваши целевые клиенты?", config, "customer_segments"
+        )
     }
 
 
 async def problem(state: LeanGraphState, config: RunnableConfig):
-    return {"problem": await ask_llm(state, "Какую проблему вы решаете?", config)}
+    return {
+        "problem": await ask_llm(state, "Какую проблему вы решаете?", config, "problem")
+    }
 
 
 async def unique_value_proposition(state: LeanGraphState, config: RunnableConfig):
     return {
         "unique_value_proposition": await ask_llm(
-            state, "Какое уникальное предложение вы предлагаете?", config
+            state,
+            "Какое уникальное предложение вы предлагаете?",
+            config,
+            "unique_value_proposition",
         )
     }
 
@@ -110,7 +163,7 @@ async def unique_value_proposition(state: LeanGraphState, config: RunnableConfig
 async def solution(state: LeanGraphState, config: RunnableConfig):
     return {
         "solution": await ask_llm(
-            state, "Какое решение вы предлагаете для этой проблемы?", config
+            state, "Какое решение вы предлагаете для этой проблемы?", config, "solution"
         )
     }
 
@@ -118,7 +171,10 @@ async def solution(state: LeanGraphState, config: RunnableConfig):
 async def channels(state: LeanGraphState, config: RunnableConfig):
     return {
         "channels": await ask_llm(
-            state, "Какие каналы привлечения клиентов вы используете?", config
+            state,
+            "Какие каналы привлечения клиентов вы используете?",
+            config,
+            "channels",
         )
     }
 
@@ -126,21 +182,26 @@ async def channels(state: LeanGraphState, config: RunnableConfig):
 async def revenue_streams(state: LeanGraphState, config: RunnableConfig):
     return {
         "revenue_streams": await ask_llm(
-            state, "Как вы планируете зарабатывать деньги?", config
+            state, "Как вы планируете зарабатывать деньги?", config, "revenue_streams"
         )
     }
 
 
 async def cost_structure(state: LeanGraphState, config: RunnableConfig):
     return {
-        "cost_structure": await ask_llm(state, "Какова структура ваших затрат?", config)
+        "cost_structure": await ask_llm(
+            state, "Какова структура ваших затрат?", config, "cost_structure"
+        )
     }
 
 
 async def key_metrics(state: LeanGraphState, config: RunnableConfig):
     return {
         "key_metrics": await ask_llm(
-            state, "Какие ключевые показатели вы будете отслеживать?", config
+            state,
+            "Какие ключевые показатели вы будете отслеживать?",
+            config,
+            "key_metrics",
         )
     }
 
@@ -148,11 +209,12 @@ async def key_metrics(state: LeanGraphState, config: RunnableConfig):
 async def unfair_advantage(state: LeanGraphState, config: RunnableConfig):
     return {
         "unfair_advantage": await ask_llm(
-            state, "Какое ваше конкурентное преимущество?", config
+            state, "Какое ваше конкурентное преимущество?", config, "unfair_advantage"
         )
     }
 
 
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_tavily import TavilySearch
 from langgraph.types import Command
@@ -317,7 +379,59 @@ async def get_feedback(
         )
 
 
-from langgraph.checkpoint.memory import MemorySaver
+# Разделы, которые генерируются параллельно после ядра
+PARALLEL_SECTIONS = tuple(
+    section for section in SECTION_DEPENDENCIES if section not in CORE_SECTIONS
+)
+
+
+class ConsistencyResult(BaseModel):
+    """Согласованные разделы Lean Canvas"""
+
+    thoughts: str = Field(description="Какие противоречия между разделами найдены")
+    channels: str = Field(description="Каналы привлечения клиентов")
+    revenue_streams: str = Field(description="Как бизнес будет зарабатывать деньги")
+    cost_structure: str = Field(description="Основные затраты")
+    key_metrics: str = Field(description="Ключевые показатели")
+    unfair_advantage: str = Field(description="Конкурентное преимущество")
+
+
+CONSISTENCY_TEMPLATE = """Ты работаешь над таблицей Lean Canvas. Разделы {sections} заполнялись параллельно и независимо друг от друга, на основе клиентов, проблемы, уникального предложения и решения.
+
+Проверь, что разделы согласованы между собой: каналы подходят клиентским сегментам, источники дохода покрывают структуру затрат, ключевые показатели отражают модель дохода и каналы.
+Исправь только противоречия, сохранив формат разделов: 1-2 коротких предложения в виде буллетов. Если противоречий нет, верни разделы без изменений.
+
+ЯЗЫК ОБЩЕНИЯ
+
+Ты должен общаться с пользователем на выбранном им языке.
+Язык пользователя: {language}.
+
+<STATE>
+{state}
+</STATE>
+
+Выведи только следующую информацию в формате JSON:
+{format_instructions}"""
+
+
+async def consistency(state: LeanGraphState, config: RunnableConfig):
+    parser = PydanticOutputParser(pydantic_object=ConsistencyResult)
+    prompt = ChatPromptTemplate.from_messages(
+        [("system", CONSISTENCY_TEMPLATE)]
+    ).partial(
+        format_instructions=parser.get_format_instructions(),
+        language=LANG,
+        sections=", ".join(PARALLEL_SECTIONS),
+    )
+
+    chain = prompt | llm | parser
+    try:
+        res = await chain.ainvoke({"state": state_to_string(state)})
+    except OutputParserException:
+        # Разделы уже заполнены, без согласования оставляем их как есть
+        return {}
+    return {section: getattr(res, section) for section in PARALLEL_SECTIONS}
+
 
 graph = StateGraph(LeanGraphState)
 
@@ -331,18 +445,25 @@ graph.add_node("6_revenue_streams", revenue_streams)
 graph.add_node("7_cost_structure", cost_structure)
 graph.add_node("8_key_metrics", key_metrics)
 graph.add_node("9_unfair_advantage", unfair_advantage)
+# defer: согласование ждет все запущенные разделы, в том числе когда
+# по фидбеку перегенерируется только один из них
+graph.add_node("10_consistency", consistency, defer=True)
 graph.add_node("get_feedback", get_feedback)
 
 graph.add_edge(START, "1_customer_segments")
 graph.add_edge("1_customer_segments", "2_problem")
 graph.add_edge("2_problem", "3_unique_value_proposition")
 graph.add_edge("3_unique_value_proposition", "3.1_check_unique")
-graph.add_edge("4_solution", "5_channels")
-graph.add_edge("5_channels", "6_revenue_streams")
-graph.add_edge("6_revenue_streams", "7_cost_structure")
-graph.add_edge("7_cost_structure", "8_key_metrics")
-graph.add_edge("8_key_metrics", "9_unfair_advantage")
-graph.add_edge("9_unfair_advantage", "get_feedback")
+for node in (
+    "5_channels",
+    "6_revenue_streams",
+    "7_cost_structure",
+    "8_key_metrics",
+    "9_unfair_advantage",
+):
+    graph.add_edge("4_solution", node)
+    graph.add_edge(node, "10_consistency")
+graph.add_edge("10_consistency", "get_feedback")
 
 app = graph.compile()
 
@@ -486,41 +607,18 @@ async def lean_canvas(
     theme: str = Field(description="На какую тему создаем Lean Canvas"),
 ):
     """Создает Lean Canvas под задачу пользователя. Полезно для проработки стартапов."""
-    client = get_client(url=os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024"))
-    thread = await client.threads.create()
-    thread_id = thread["thread_id"]
-    push_ui_message(
-        "agent_execution",
-        {
-            "agent": "lean_canvas",
-            "node": "__start__",
-        },
-    )
-    state = {}
-    async for chunk in client.runs.stream(
-        thread_id=thread_id,
-        assistant_id="lean_canvas",
-        input={"main_task": theme},
-        stream_mode=["values", "updates"],
-        on_disconnect="cancel",
+    state = await run_subagent(
+        "lean_canvas",
+        "lean_canvas",
+        app,
+        {"main_task": theme},
         config={
             "configurable": {
-                "thread_id": thread_id,
                 "need_interrupt": False,
                 "skip_search": False if os.getenv("TAVILY_API_KEY") else True,
             }
         },
-    ):
-        if chunk.event == "values":
-            state = chunk.data
-        elif chunk.event == "updates":
-            push_ui_message(
-                "agent_execution",
-                {
-                    "agent": "lean_canvas",
-                    "node": list(chunk.data.keys())[0],
-                },
-            )
+    )
     file_id = str(uuid.uuid4())
     html = lean_canvas_to_html(state)
     text = lean_canvas_to_text(state)
@@ -1,15 +1,12 @@
 import asyncio
 import base64
-import os
 import uuid
 from typing import Annotated
 
 from langchain_core.tools import tool
 from langgraph.constants import START, END
 from langgraph.graph import StateGraph
-from langgraph.graph.ui import push_ui_message
 from langgraph.prebuilt import InjectedState
-from langgraph_sdk import get_client
 
 from giga_agent.agents.meme_agent.config import MemeState, ConfigSchema
 from giga_agent.agents.meme_agent.nodes.images import image_node
@@ -17,6 +14,7 @@ from giga_agent.agents.meme_agent.nodes.text import text_node
 from giga_agent.utils.llm import is_llm_image_inline
 from giga_agent.utils.env import load_project_env
 from giga_agent.utils.messages import filter_tool_calls
+from giga_agent.utils.subagents import run_subagent
 
 load_project_env()
 
@@ -46,17 +44,11 @@ async def create_meme(
     from giga_agent.config import llm
 
     last_mes = filter_tool_calls(state["messages"][-1])
-    client = get_client(url=os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024"))
-    thread = await client.threads.create()
-    thread_id = thread["thread_id"]
-    push_ui_message(
-        "agent_execution",
-        {"agent": "create_meme", "node": "__start__"},
-    )
-    async for chunk in client.runs.stream(
-        thread_id=thread_id,
-        assistant_id="meme",
-        input={
+    state = await run_subagent(
+        "create_meme",
+        "meme",
+        graph,
+        {
             "task": task,
             "messages": state["messages"][:-1]
             + [
@@ -68,19 +60,7 @@ async def create_meme(
                 ),
             ],
         },
-        stream_mode=["values", "updates"],
-        on_disconnect="cancel",
-    ):
-        if chunk.event == "values":
-            state = chunk.data
-        elif chunk.event == "updates":
-            push_ui_message(
-                "agent_execution",
-                {
-                    "agent": "create_meme",
-                    "node": list(chunk.data.keys())[0],
-                },
-            )
+    )
     if is_llm_image_inline():
         uploaded_file_id = (
             await llm.aupload_file(("image.png", base64.b64decode(state["meme_image"])))
@@ -0,0 +1,270 @@
+"""Рендер текста мема на изображении.
+
+Модуль выполняется в пуле процессов (см. `giga_agent.utils.workers`),
+поэтому импортирует только PIL. Шрифты кэшируются в каждом воркере.
+"""
+
+import os
+from functools import lru_cache
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+# Минимальный размер шрифта относительно исходного при подгонке текста
+MIN_FONT_SCALE = 0.3
+# Доля высоты картинки, которую может занять каждый из блоков текста
+MAX_TEXT_BLOCK_RATIO = 0.35
+LINE_SPACING = 5
+
+
+def contains_cjk(text: str) -> bool:
+    """Грубая проверка наличия CJK/корейских/японских символов."""
+    for ch in text:
+        code = ord(ch)
+        # CJK Unified Ideographs and Extensions
+        if (
+            0x3400 <= code <= 0x4DBF
+            or 0x4E00 <= code <= 0x9FFF
+            or 0xF900 <= code <= 0xFAFF
+            or 0x20000 <= code <= 0x2A6DF
+            or 0x2A700 <= code <= 0x2B73F
+            or 0x2B740 <= code <= 0x2B81F
+            or 0x2B820 <= code <= 0x2CEAF
+            or 0x2CEB0 <= code <= 0x2EBEF
+        ):
+            return True
+        # Hiragana, Katakana
+        if 0x3040 <= code <= 0x30FF:
+            return True
+        # Hangul
+        if 0xAC00 <= code <= 0xD7AF:
+            return True
+    return False
+
+
+def contains_hangul(text: str) -> bool:
+    for ch in text:
+        code = ord(ch)
+        if (
+            0xAC00 <= code <= 0xD7AF
+            or 0x1100 <= code <= 0x11FF
+            or 0x3130 <= code <= 0x318F
+            or 0xA960 <= code <= 0xA97F
+            or 0xD7B0 <= code <= 0xD7FF
+        ):
+            return True
+    return False
+
+
+def contains_kana(text: str) -> bool:
+    for ch in text:
+        code = ord(ch)
+        if 0x3040 <= code <= 0x30FF or 0x31F0 <= code <= 0x31FF:
+            return True
+    return False
+
+
+@lru_cache(maxsize=256)
+def load_font(font_file: str, size: int) -> Optional[ImageFont.FreeTypeFont]:
+    """Загружает шрифт из папки модуля один раз на (файл, размер)."""
+    try:
+        return ImageFont.truetype(os.path.join(__location__, font_file), size)
+    except Exception:
+        return None
+
+
+def select_font_for_text(
+    font_size: int, default_font_path: str, sample_text: str
+) -> Tuple[ImageFont.ImageFont, bool]:
+    """Выбирает шрифт из локальной папки.
+    - Латиница/кириллица/без CJK → Impact (default_font_path)
+    - Корейский (есть хангыль) → BlackHanSans-Regular.ttf
+    - Японский (есть каны) → DelaGothicOne-Regular.ttf
+    - Китайский (CJK без кан/хангыля) → ZCOOLQingKeHuangYou-Regular.ttf
+    """
+    is_any_cjk = (
+        contains_cjk(sample_text)
+        or contains_hangul(sample_text)
+        or contains_kana(sample_text)
+    )
+    if not is_any_cjk:
+        font = load_font(default_font_path, font_size)
+        return font or ImageFont.load_default(), False
+
+    # Приоритет: KR → JP → CN
+    font_files = []
+    if contains_hangul(sample_text):
+        font_files.append("BlackHanSans-Regular.ttf")
+    if contains_kana(sample_text):
+        font_files.append("DelaGothicOne-Regular.ttf")
+    # Китайский по умолчанию для прочих CJK, последний шанс — Impact
+    font_files += ["ZCOOLQingKeHuangYou-Regular.ttf", default_font_path]
+    for font_file in font_files:
+        font = load_font(font_file, font_size)
+        if font:
+            return font, True
+    return ImageFont.load_default(), True
+
+
+def text_size(
+    draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, stroke: int
+) -> Tuple[int, int]:
+    """Возвращает (w, h) c учётом версии Pillow."""
+    if hasattr(draw, "textbbox"):  # Pillow ≥ 8.0, в т.ч. ≥10
+        bbox = draw.textbbox((0, 0), text, font=font, stroke_width=stroke)
+        return bbox[2] - bbox[0], bbox[3] - bbox[1]
+    else:  # старые Pillow
+        return draw.textsize(text, font=font)  # type: ignore[attr-defined]
+
+
+def wrap_lines(draw, text, font, max_width, is_cjk: bool) -> List[str]:
+    """Разбивает текст на строки так, чтобы каждая влезла в max_width.
+    Для CJK (без пробелов) переносим по символам, не upper()."""
+    if is_cjk:
+        lines = []
+        current = ""
+        for ch in text:
+            test = current + ch
+            if draw.textlength(test, font=font) <= max_width:
+                current = test
+            else:
+                if current:
+                    lines.append(current)
+                current = ch
+        if current:
+            lines.append(current)
+        return lines
+    else:
+        words = text.upper().split()
+        lines, line = [], []
+        for word in words:
+            test = " ".join(line + [word])
+            if draw.textlength(test, font=font) <= max_width:
+                line.append(word)
+            else:
+                if line:
+                    lines.append(" ".join(line))
+                line = [word]
+        if line:
+            lines.append(" ".join(line))
+        return lines
+
+
+def layout_text(draw, text, font, max_width, is_cjk, stroke):
+    """Переносит текст и измеряет строки: [(строка, ширина, высота)]."""
+    return [
+        (line, *text_size(draw, line, font, stroke))
+        for line in wrap_lines(draw, text, font, max_width, is_cjk)
+    ]
+
+
+def fit_font(
+    draw,
+    up_text,
+    down_text,
+    font_path,
+    max_font_size,
+    max_width,
+    max_block_height,
+    stroke,
+):
+    """Подбирает наибольший размер шрифта, при котором оба блока текста
+    помещаются по ширине и высоте. Бинарный поиск по измеренным размерам."""
+    sample_text = f"{up_text}\n{down_text}"
+
+    def measure(size):
+        font, is_cjk = select_font_for_text(size, font_path, sample_text)
+        top = layout_text(draw, up_text, font, max_width, is_cjk, stroke)
+        bottom = layout_text(draw, down_text, font, max_width, is_cjk, stroke)
+        fits = all(
+            sum(h + LINE_SPACING for _, _, h in block) <= max_block_height
+            and all(w <= max_width for _, w, _ in block)
+            for block in (top, bottom)
+        )
+        return fits, font, top, bottom
+
+    low = max(1, int(max_font_size * MIN_FONT_SCALE))
+    best = None
+    high = max_font_size
+    while low <= high:
+        size = (low + high) // 2
+        result = measure(size)
+        if result[0]:
+            best = result
+            low = size + 1
+        else:
+            high = size - 1
+    if best is None:
+        # Текст не помещается даже минимальным шрифтом — рисуем минимальным
+        best = measure(max(1, int(max_font_size * MIN_FONT_SCALE)))
+    _, font, top, bottom = best
+    return font, top, bottom
+
+
+def memeify(
+    img_bytes: bytes,
+    up_text: str,
+    down_text: str,
+    font_path: str = "impact.ttf",  # путь к шрифту Impact
+    font_ratio: float = 0.07,  # высота текста ≈ 10 % от ширины картинки
+    stroke: int = 2,  # толщина обводки
+    margin_ratio: float = 0.05,  # поля сверху/снизу
+) -> bytes:
+    """Наносит up_text и down_text на картинку, возвращает bytes."""
+    # открываем картинку
+    im = Image.open(BytesIO(img_bytes)).convert("RGB")
+    w, h = im.size
+    draw = ImageDraw.Draw(im)
+
+    max_width = w - int(w * margin_ratio * 2)
+
+    # подбираем размер шрифта: не больше доли от ширины картинки
+    font, top_lines, bottom_lines = fit_font(
+        draw,
+        up_text,
+        down_text,
+        font_path,
+        int(w * font_ratio),
+        max_width,
+        int(h * MAX_TEXT_BLOCK_RATIO),
+        stroke,
+    )
+
+    # --- верхний текст ---
+    y = int(h * margin_ratio)
+    for line, line_w, line_h in top_lines:
+        x = (w - line_w) // 2
+        # чёрный контур
+        draw.text(
+            (x, y),
+            line,
+            font=font,
+            fill="white",
+            stroke_width=stroke,
+            stroke_fill="black",
+        )
+        y += line_h + LINE_SPACING  # небольшой интервал между строками
+
+    # --- нижний текст --- рисуем снизу вверх
+    y = h - int(h * margin_ratio)
+    for line, line_w, line_h in bottom_lines[::-1]:
+        y -= line_h
+        x = (w - line_w) // 2
+        draw.text(
+            (x, y),
+            line,
+            font=font,
+            fill="white",
+            stroke_width=stroke,
+            stroke_fill="black",
+        )
+        y -= LINE_SPACING
+
+    # сохраняем в bytes
+    out = BytesIO()
+    im = im.resize((512, 512), Image.Resampling.LANCZOS)
+    im.save(out, format="PNG")
+    return out.getvalue()
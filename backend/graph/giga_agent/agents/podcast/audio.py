@@ -0,0 +1,121 @@
+import asyncio
+from typing import Optional
+
+from pydub import AudioSegment
+from pydub.utils import get_encoder_name
+
+# Формат по умолчанию совпадает с голосами Sber TTS (*_24000, wav16)
+DEFAULT_FRAME_RATE = 24000
+DEFAULT_CHANNELS = 1
+DEFAULT_SAMPLE_WIDTH = 2
+
+# Формат сырого PCM для ffmpeg по ширине сэмпла в байтах
+PCM_FORMATS = {1: "u8", 2: "s16le", 3: "s24le", 4: "s32le"}
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class Mp3StreamEncoder:
+    """Потоковый кодировщик аудио в mp3.
+
+    Сегменты приводятся к формату первого сегмента и пишутся сырым PCM
+    в stdin одного процесса ffmpeg. Готовый mp3 читается из stdout
+    параллельно с записью в один растущий буфер, поэтому не нужно
+    склеивать `AudioSegment` и экспортировать весь подкаст в конце.
+    """
+
+    def __init__(self) -> None:
+        self.frame_rate: Optional[int] = None
+        self.channels: Optional[int] = None
+        self.sample_width: Optional[int] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._mp3 = bytearray()
+
+    async def _start(self, frame_rate: int, channels: int, sample_width: int) -> None:
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self._process = await asyncio.create_subprocess_exec(
+            get_encoder_name(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-f",
+            PCM_FORMATS[sample_width],
+            "-ar",
+            str(frame_rate),
+            "-ac",
+            str(channels),
+            "-i",
+            "pipe:0",
+            "-f",
+            "mp3",
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            chunk = await self._process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._mp3 += chunk
+
+    async def _write(self, pcm: bytes) -> None:
+        self._process.stdin.write(pcm)
+        await self._process.stdin.drain()
+
+    async def add_segment(self, segment: AudioSegment) -> None:
+        """Добавляет сегмент в конец дорожки."""
+        if self._process is None:
+            await self._start(
+                segment.frame_rate, segment.channels, segment.sample_width
+            )
+        segment = (
+            segment.set_frame_rate(self.frame_rate)
+            .set_channels(self.channels)
+            .set_sample_width(self.sample_width)
+        )
+        await self._write(segment.raw_data)
+
+    async def add_audio(self, audio_data: bytes) -> None:
+        """Добавляет аудио-файл (например, wav от Sber TTS)."""
+        await self.add_segment(AudioSegment(audio_data))
+
+    async def add_silence(self, duration: int) -> None:
+        """Добавляет тишину длительностью `duration` миллисекунд."""
+        if self._process is None:
+            await self._start(
+                DEFAULT_FRAME_RATE, DEFAULT_CHANNELS, DEFAULT_SAMPLE_WIDTH
+            )
+        frames = int(self.frame_rate * duration / 1000)
+        silence = b"\x80" if self.sample_width == 1 else b"\x00" * self.sample_width
+        await self._write(silence * frames * self.channels)
+
+    async def finish(self) -> bytes:
+        """Завершает кодирование и возвращает mp3."""
+        if self._process is None:
+            # Если нет аудио сегментов, создаем короткую тишину
+            await self.add_silence(1000)
+        self._process.stdin.close()
+        await self._process.stdin.wait_closed()
+        await self._reader
+        stderr = await self._process.stderr.read()
+        return_code = await self._process.wait()
+        if return_code != 0:
+            raise RuntimeError(
+                f"ffmpeg exited with code {return_code}: {stderr.decode(errors='ignore')}"
+            )
+        return bytes(self._mp3)
+
+    async def aclose(self) -> None:
+        """Останавливает ffmpeg, если кодирование не было завершено."""
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        if self._reader is not None:
+            self._reader.cancel()
@@ -10,6 +10,7 @@ podcast_llm = load_llm().with_config(tags=["nostream"])
 
 class ConfigSchema(TypedDict):
     save_files: bool
+    script_mode: Literal["two_pass", "single_pass", "streaming", "pipelined"]
 
 
 class PodcastState(TypedDict):
@@ -22,4 +23,5 @@ class PodcastState(TypedDict):
     tone: Literal["entertaining", "formal"]
     length: Literal["short", "medium"]
     audio: str
+    audio_file_id: str
     transcript: str
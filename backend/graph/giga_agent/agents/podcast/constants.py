@@ -40,3 +40,11 @@ SUPPORTED_LANGUAGES = ["Russian"]  # Только русский для Sber TTS
 JINA_READER_URL = "https://r.jina.ai/"
 JINA_RETRY_ATTEMPTS = 3
 JINA_RETRY_DELAY = 5  # in seconds
+
+# Script generation modes:
+# two_pass — черновик и отдельный вызов LLM для улучшения диалога
+# single_pass — один вызов LLM
+# streaming — один вызов LLM, реплики проверяются по мере генерации
+# pipelined — как streaming, но синтез речи начинается с первых реплик
+SCRIPT_MODES = ("two_pass", "single_pass", "streaming", "pipelined")
+PODCAST_SCRIPT_MODE = os.getenv("PODCAST_SCRIPT_MODE", "two_pass")
@@ -2,21 +2,22 @@ import asyncio
 import base64
 import os
 import uuid
-from typing import Optional, Annotated
+from typing import AsyncIterable, Iterable, Optional, Annotated, Union
 
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 from langgraph.constants import START
 from langgraph.graph import StateGraph
-from langgraph.graph.ui import push_ui_message
 from langgraph.prebuilt import InjectedState
-from langgraph_sdk import get_client
-from pydub import AudioSegment
+from langgraph.store.base import BaseStore
 
+from giga_agent.agents.podcast.audio import Mp3StreamEncoder
 from giga_agent.agents.podcast.config import (
     PodcastState,
     ConfigSchema,
     podcast_llm,
 )
+from giga_agent.agents.podcast.constants import PODCAST_SCRIPT_MODE
 from giga_agent.agents.podcast.prompts import (
     SYSTEM_PROMPT,
     LENGTH_MODIFIERS,
@@ -27,13 +28,18 @@ from giga_agent.agents.podcast.prompts import (
 )
 from giga_agent.agents.podcast.schema import ShortDialogue, MediumDialogue
 from giga_agent.agents.podcast.tts_sber import (
-    generate_podcast_audio,
-    get_sber_tts_token,
+    SberTTSSession,
+    synthesize_dialogue,
+)
+from giga_agent.agents.podcast.utils import (
+    DialogueStream,
+    parse_url,
+    generate_script,
 )
-from giga_agent.agents.podcast.utils import parse_url, generate_script
 from giga_agent.utils.lang import LANG
 from giga_agent.utils.env import load_project_env
 from giga_agent.utils.messages import filter_tool_calls
+from giga_agent.utils.subagents import run_subagent
 
 load_project_env()
 
@@ -66,7 +72,7 @@ async def summarize_messages(state: PodcastState):
         return {}
 
 
-async def script(state: PodcastState):
+def build_system_prompt(state: PodcastState) -> str:
     # Модифицируем системный промпт на основе пользовательского ввода
     modified_system_prompt = SYSTEM_PROMPT
     lang_prompt = LANGUAGE_PROMPT.format(language=LANG)
@@ -80,24 +86,11 @@ async def script(state: PodcastState):
     modified_system_prompt += f"\n\n{lang_prompt}"
     if state.get("length") and state.get("length") in LENGTH_MODIFIERS:
         modified_system_prompt += f"\n\n{LENGTH_MODIFIERS[state.get('length')]}"
-    if state.get("length") == "short":
-        llm_output = await generate_script(
-            modified_system_prompt, state.get("podcast_text"), ShortDialogue
-        )
-    else:
-        llm_output = await generate_script(
-            modified_system_prompt, state.get("podcast_text"), MediumDialogue
-        )
-    return {"dialogue": llm_output}
+    return modified_system_prompt
 
 
-async def audio_gen(state: PodcastState):
-    # Обрабатываем диалог
-    audio_segments = []
+def make_transcript(llm_output: Union[ShortDialogue, MediumDialogue]) -> str:
     transcript = ""
-    total_characters = 0
-    llm_output = state.get("dialogue")
-
     for line in llm_output.dialogue:
 
         if line.speaker == "Ведущая (Жанна)":
@@ -106,36 +99,76 @@ async def audio_gen(state: PodcastState):
             speaker_label = f"**{llm_output.name_of_guest}**: {line.text}"
 
         transcript += speaker_label + "\n\n"
-        total_characters += len(line.text)
-        sber_auth_token = os.getenv("SALUTE_SPEECH")
-        salute_speech_scope = os.getenv("SALUTE_SPEECH_SCOPE", "SALUTE_SPEECH_PERS")
-        salute_access_token = await get_sber_tts_token(sber_auth_token, scope=salute_speech_scope)
-        try:
-            audio_data = await generate_podcast_audio(
-                line.text, salute_access_token, line.speaker
-            )
-            if audio_data is not None:
-                # Читаем аудио файл в AudioSegment
-                audio_segment = AudioSegment(audio_data)
-                audio_segments.append(audio_segment)
-
-        except Exception as e:
-            # Создаем тишину вместо аудио при ошибке
-            silence = AudioSegment.silent(duration=2000)  # 2 секунды тишины
-            audio_segments.append(silence)
-
-    # Объединяем все аудио сегменты
-    if audio_segments:
-        combined_audio = sum(audio_segments)
-    else:
-        # Если нет аудио сегментов, создаем короткую тишину
-        combined_audio = AudioSegment.silent(duration=1000)
+    return transcript
 
-    audio_file = await asyncio.to_thread(combined_audio.export, format="mp3")
-    audio_bytes = await asyncio.to_thread(audio_file.read)
+
+async def encode_dialogue(
+    lines: Union[Iterable, AsyncIterable], store: Optional[BaseStore]
+) -> dict:
+    """Синтезирует и кодирует реплики в mp3, возвращает обновление состояния."""
+    session = SberTTSSession(
+        os.getenv("SALUTE_SPEECH"),
+        scope=os.getenv("SALUTE_SPEECH_SCOPE", "SALUTE_SPEECH_PERS"),
+    )
+    encoder = Mp3StreamEncoder()
+    try:
+        async for audio_data in synthesize_dialogue(lines, session):
+            if audio_data is not None:
+                await encoder.add_audio(audio_data)
+            else:
+                # Создаем тишину вместо аудио при ошибке
+                await encoder.add_silence(2000)  # 2 секунды тишины
+        audio_bytes = await encoder.finish()
+    finally:
+        await encoder.aclose()
 
     audio = base64.b64encode(audio_bytes).decode("ascii")
-    return {"audio": audio, "transcript": transcript}
+    if store is None:
+        return {"audio": audio}
+    # Кладем аудио сразу в хранилище, а в состоянии оставляем только ссылку
+    file_id = str(uuid.uuid4())
+    await store.aput(
+        ("audio",),
+        file_id,
+        {"type": "audio/mp3", "file_id": file_id, "data": audio},
+        ttl=None,
+        index=False,
+    )
+    return {"audio_file_id": file_id}
+
+
+async def script(state: PodcastState, config: RunnableConfig, store: BaseStore):
+    system_prompt = build_system_prompt(state)
+    output_model = ShortDialogue if state.get("length") == "short" else MediumDialogue
+    mode = config["configurable"].get("script_mode", PODCAST_SCRIPT_MODE)
+    if mode == "pipelined":
+        # Синтезируем речь, пока LLM дописывает следующие реплики
+        stream = DialogueStream(
+            system_prompt, state.get("podcast_text"), output_model
+        )
+        audio_update = await encode_dialogue(stream, store)
+        return {
+            "dialogue": stream.result,
+            "transcript": make_transcript(stream.result),
+            **audio_update,
+        }
+    llm_output = await generate_script(
+        system_prompt, state.get("podcast_text"), output_model, mode=mode
+    )
+    return {"dialogue": llm_output}
+
+
+def route_after_script(state: PodcastState):
+    # В режиме pipelined аудио уже готово
+    if state.get("transcript"):
+        return "__end__"
+    return "audio_gen"
+
+
+async def audio_gen(state: PodcastState, store: BaseStore):
+    llm_output = state.get("dialogue")
+    audio_update = await encode_dialogue(llm_output.dialogue, store)
+    return {**audio_update, "transcript": make_transcript(llm_output)}
 
 
 workflow = StateGraph(PodcastState, ConfigSchema)
@@ -148,7 +181,9 @@ workflow.add_node("audio_gen", audio_gen)
 workflow.add_edge(START, "download")
 workflow.add_edge("download", "summarize_messages")
 workflow.add_edge("summarize_messages", "script")
-workflow.add_edge("script", "audio_gen")
+workflow.add_conditional_edges(
+    "script", route_after_script, ["audio_gen", "__end__"]
+)
 workflow.add_edge("audio_gen", "__end__")
 
 
@@ -171,15 +206,6 @@ async def podcast_generate(
     """
     if not url and not use_messages:
         raise ValueError("You must specify either url or use_messages!")
-    conf = {
-        "configurable": {
-            "thread_id": str(uuid.uuid4()),
-        }
-    }
-    push_ui_message(
-        "agent_execution",
-        {"agent": "podcast_generate", "node": "__start__"},
-    )
     input_ = {}
     if use_messages:
         input_["use_messages"] = use_messages
@@ -187,35 +213,22 @@ async def podcast_generate(
         input_["messages"] = state["messages"][:-1] + [last_mes]
     if url:
         input_["url"] = url
-    client = get_client(url=os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024"))
-    thread = await client.threads.create()
-    thread_id = thread["thread_id"]
-    state = {}
-    async for chunk in client.runs.stream(
-        thread_id=thread_id,
-        assistant_id="podcast",
-        input=input_,
-        stream_mode=["values", "updates"],
-        on_disconnect="cancel",
-        config=conf,
-    ):
-        if chunk.event == "values":
-            state = chunk.data
-        elif chunk.event == "updates":
-            push_ui_message(
-                "agent_execution",
-                {
-                    "agent": "podcast_generate",
-                    "node": list(chunk.data.keys())[0],
-                },
-            )
-    file_id = str(uuid.uuid4())
+    state = await run_subagent("podcast_generate", "podcast", graph, input_)
+    if state.get("audio_file_id"):
+        # Аудио уже лежит в хранилище, передаем только ссылку на него
+        file_id = state["audio_file_id"]
+        attachment = {"type": "audio/mp3", "file_id": file_id}
+    else:
+        file_id = str(uuid.uuid4())
+        attachment = {
+            "type": "audio/mp3",
+            "file_id": file_id,
+            "data": state.get("audio"),
+        }
     return {
         "transcript": state.get("transcript"),
         "message": f'В результате выполнения было сгенерирован аудио-файл {file_id}. Покажи его пользователю через "![Аудио](audio:{file_id})" и напиши ответ с краткой информацией по подкасту',
-        "giga_attachments": [
-            {"type": "audio/mp3", "file_id": file_id, "data": state.get("audio")}
-        ],
+        "giga_attachments": [attachment],
     }
 
 
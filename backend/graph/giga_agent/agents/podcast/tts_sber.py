@@ -1,12 +1,26 @@
+import hashlib
+import os
+import unicodedata
 import uuid
 import asyncio
 import aiohttp
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Union
+
+from giga_agent.utils.cache import DiskLRUCache, make_cache_key
 
 
 # Константы для Sber TTS
 SBER_TTS_RETRY_ATTEMPTS = 3
 SBER_TTS_RETRY_DELAY = 5  # в секундах
+# Максимум одновременных запросов синтеза на один аккаунт SaluteSpeech
+SBER_TTS_PARALLEL = int(os.getenv("SBER_TTS_PARALLEL", 4))
+# Сколько раз пробуем синтезировать реплику (каждая следующая попытка — с новым токеном)
+SBER_TTS_LINE_ATTEMPTS = int(os.getenv("SBER_TTS_LINE_ATTEMPTS", 2))
+# Кэш синтезированных реплик. SBER_TTS_CACHE_MAX_MB=0 отключает кэш
+SBER_TTS_CACHE_DIR = os.getenv("SBER_TTS_CACHE_DIR", "cache/tts")
+SBER_TTS_CACHE_MAX_MB = int(os.getenv("SBER_TTS_CACHE_MAX_MB", 512))
+
+tts_cache = DiskLRUCache(SBER_TTS_CACHE_DIR, SBER_TTS_CACHE_MAX_MB * 1024 * 1024)
 
 # Доступные голоса Sber SmartSpeech
 SBER_VOICES = {
@@ -51,10 +65,34 @@ async def get_sber_tts_token(
     return None
 
 
+def normalize_tts_text(text: str) -> str:
+    """Приводит текст к каноничному виду: NFC и схлопнутые пробелы."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def tts_cache_key(text: str, voice: str, format: str = "wav16") -> str:
+    """Ключ кэша реплики: (голос, формат, нормализованный текст)."""
+    return make_cache_key(voice, format, normalize_tts_text(text))
+
+
+def speaker_voice(speaker: str) -> str:
+    """Голос Sber TTS для спикера подкаста."""
+    if speaker in ("Host (Jane)", "Ведущая (Жанна)"):
+        return "May_24000"
+    return "Bys_24000"
+
+
 async def synthesize_sber_speech(
     text: str, token: str, format: str = "wav16", voice: str = "Bys_24000"
 ) -> Optional[bytes]:
-    """Асинхронный синтез речи через Sber SmartSpeech API."""
+    """Асинхронный синтез речи через Sber SmartSpeech API.
+
+    Результат сохраняется в кэш (см. `tts_cache_key`); кэш проверяет
+    вызывающий код до получения токена.
+    """
+    cache_key = tts_cache_key(text, voice, format)
+    text = normalize_tts_text(text)
+
     url = "https://smartspeech.sber.ru/rest/v1/text:synthesize"
     headers = {
         "Authorization": f"Bearer {token}",
@@ -75,6 +113,7 @@ async def synthesize_sber_speech(
                 ) as response:
                     response.raise_for_status()
                     audio_bytes = await response.read()
+                    await tts_cache.aset(cache_key, audio_bytes)
                     return audio_bytes
         except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             if attempt == SBER_TTS_RETRY_ATTEMPTS:
@@ -97,8 +136,7 @@ async def generate_sber_audio(
     Returns:
         Сырые байты аудио или None при ошибке
     """
-    voice = "May_24000" if speaker == "Host (Jane)" else "Bys_24000"
-    return await synthesize_sber_speech(text, token, voice=voice)
+    return await synthesize_sber_speech(text, token, voice=speaker_voice(speaker))
 
 
 def get_available_voices() -> dict:
@@ -126,3 +164,106 @@ async def generate_podcast_audio(
 
     except Exception as e:
         raise
+
+
+# Семафоры по аккаунтам: общие для всех подкастов процесса
+_ACCOUNT_SEMAPHORES: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_account_semaphore(auth_token: Optional[str]) -> asyncio.Semaphore:
+    """Возвращает семафор, ограничивающий число запросов синтеза для аккаунта."""
+    key = hashlib.sha256((auth_token or "").encode("utf-8")).hexdigest()
+    if key not in _ACCOUNT_SEMAPHORES:
+        _ACCOUNT_SEMAPHORES[key] = asyncio.Semaphore(SBER_TTS_PARALLEL)
+    return _ACCOUNT_SEMAPHORES[key]
+
+
+class SberTTSSession:
+    """Сессия синтеза речи для одного аккаунта SaluteSpeech.
+
+    Получает токен доступа один раз на подкаст и обновляет его,
+    если синтез реплики не удался (например, токен истёк).
+    """
+
+    def __init__(self, auth_token: Optional[str], scope: str = "SALUTE_SPEECH_PERS"):
+        self.auth_token = auth_token
+        self.scope = scope
+        self._token: Optional[str] = None
+        self._token_lock = asyncio.Lock()
+        self._semaphore = get_account_semaphore(auth_token)
+
+    async def get_token(self, stale_token: Optional[str] = None) -> Optional[str]:
+        """Возвращает токен доступа. Если передан `stale_token` и он всё ещё
+        текущий — получает новый."""
+        async with self._token_lock:
+            if self._token is None or self._token == stale_token:
+                self._token = await get_sber_tts_token(
+                    self.auth_token, scope=self.scope
+                )
+            return self._token
+
+    async def synthesize_line(self, text: str, speaker: str) -> Optional[bytes]:
+        """Синтезирует одну реплику. Возвращает None, если все попытки неудачны."""
+        # Реплики из кэша не ждут слота аккаунта и не запрашивают токен
+        cached = await tts_cache.aget(tts_cache_key(text, speaker_voice(speaker)))
+        if cached is not None:
+            return cached
+        async with self._semaphore:
+            token = await self.get_token()
+            for attempt in range(1, SBER_TTS_LINE_ATTEMPTS + 1):
+                try:
+                    audio_data = await generate_podcast_audio(text, token, speaker)
+                except Exception:
+                    audio_data = None
+                if audio_data is not None:
+                    return audio_data
+                if attempt < SBER_TTS_LINE_ATTEMPTS:
+                    token = await self.get_token(stale_token=token)
+        return None
+
+
+async def synthesize_dialogue(
+    lines: Union[Iterable, AsyncIterable], session: SberTTSSession
+) -> AsyncIterator[Optional[bytes]]:
+    """Синтезирует реплики диалога параллельно и отдаёт аудио в исходном порядке.
+
+    Реплика отдаётся сразу, как только готовы она и все предыдущие, поэтому
+    потребитель может кодировать аудио, пока синтезируются следующие реплики.
+    `lines` может быть асинхронным итератором: тогда синтез реплики начинается,
+    как только она получена, не дожидаясь остальных (например, пока LLM ещё
+    пишет сценарий). Для неудачных реплик отдаётся None.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def schedule(line) -> None:
+        queue.put_nowait(
+            asyncio.create_task(session.synthesize_line(line.text, line.speaker))
+        )
+
+    async def produce() -> None:
+        try:
+            if isinstance(lines, AsyncIterable):
+                async for line in lines:
+                    schedule(line)
+            else:
+                for line in lines:
+                    schedule(line)
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    tasks = []
+    try:
+        while (task := await queue.get()) is not None:
+            tasks.append(task)
+            yield await task
+        # Пробрасываем ошибку источника реплик, если она была
+        await producer
+    finally:
+        producer.cancel()
+        while not queue.empty():
+            task = queue.get_nowait()
+            if task is not None:
+                tasks.append(task)
+        for task in tasks:
+            task.cancel()
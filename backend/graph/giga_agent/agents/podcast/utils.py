@@ -1,18 +1,25 @@
 import asyncio
 import json
 import re
-from typing import Any, Optional, Union, Type
+from typing import Any, AsyncIterator, List, Optional, Union, Type
 
 import aiohttp
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.utils.json import parse_partial_json
+from pydantic import ValidationError
 
 from giga_agent.agents.podcast.config import podcast_llm
 from giga_agent.agents.podcast.constants import (
     JINA_READER_URL,
     JINA_RETRY_ATTEMPTS,
     JINA_RETRY_DELAY,
+    PODCAST_SCRIPT_MODE,
+)
+from giga_agent.agents.podcast.schema import (
+    DialogueItem,
+    ShortDialogue,
+    MediumDialogue,
 )
-from giga_agent.agents.podcast.schema import ShortDialogue, MediumDialogue
 
 
 async def parse_url(url: str) -> str:
@@ -37,8 +44,18 @@ async def generate_script(
     system_prompt: str,
     input_text: str,
     output_model: Union[Type[ShortDialogue], Type[MediumDialogue]],
+    mode: str = PODCAST_SCRIPT_MODE,
 ) -> Union[ShortDialogue, MediumDialogue]:
-    """Получение диалога от LLM."""
+    """Получение диалога от LLM.
+
+    `mode` — режим генерации (см. `SCRIPT_MODES`). Режим `pipelined`
+    обрабатывается в графе, здесь он равнозначен `streaming`.
+    """
+    if mode in ("streaming", "pipelined"):
+        stream = DialogueStream(system_prompt, input_text, output_model)
+        async for _ in stream:
+            pass
+        return stream.result
 
     # Вызов LLM в первый раз
     first_draft_dialogue = await call_gigachat(system_prompt, input_text, output_model)
@@ -46,6 +63,9 @@ async def generate_script(
     if first_draft_dialogue is None:
         raise Exception("Failed to get the first dialogue draft from GigaChat")
 
+    if mode == "single_pass":
+        return first_draft_dialogue
+
     # Вызов LLM во второй раз для улучшения диалога
     system_prompt_with_dialogue = f"{system_prompt}\n\nВот первый черновик диалога, который ты предоставил:\n\n{first_draft_dialogue.model_dump_json()}."
     final_dialogue = await call_gigachat(
@@ -60,6 +80,97 @@ async def generate_script(
     return final_dialogue
 
 
+def _parse_partial_dialogue(text: str) -> Optional[dict]:
+    """Разбирает незаконченный JSON ответа LLM."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        response_json = parse_partial_json(text[start:])
+    except json.JSONDecodeError:
+        return None
+    return response_json if isinstance(response_json, dict) else None
+
+
+class DialogueStream:
+    """Потоковая генерация диалога одним вызовом LLM.
+
+    При итерации отдаёт проверенные `DialogueItem` по мере того, как LLM
+    дописывает их в JSON. Реплика считается готовой, когда после неё
+    началась следующая. После завершения итерации полный диалог лежит
+    в `result`.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        input_text: str,
+        output_model: Union[Type[ShortDialogue], Type[MediumDialogue]],
+    ):
+        self.messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=input_text),
+        ]
+        self.output_model = output_model
+        self.result: Optional[Union[ShortDialogue, MediumDialogue]] = None
+
+    async def __aiter__(self) -> AsyncIterator[DialogueItem]:
+        text = ""
+        partial = None
+        items: List[DialogueItem] = []
+        seen = 0
+        async for chunk in podcast_llm.astream(self.messages):
+            text += chunk.content
+            # Новая реплика может завершиться только на закрывающей скобке
+            if "}" not in chunk.content:
+                continue
+            partial = _parse_partial_dialogue(text) or partial
+            dialogue = (partial or {}).get("dialogue")
+            if not isinstance(dialogue, list):
+                continue
+            # Последняя реплика может быть ещё не дописана
+            while seen < len(dialogue) - 1:
+                seen += 1
+                try:
+                    item = DialogueItem.model_validate(dialogue[seen - 1])
+                except ValidationError:
+                    continue
+                items.append(item)
+                yield item
+
+        result = parse_text_to_json(text, self.output_model)
+        if result is not None and result.dialogue[: len(items)] == items:
+            for item in result.dialogue[len(items) :]:
+                yield item
+        else:
+            # Полный ответ не прошёл проверку: оставляем уже отданные реплики
+            # и дописываем остальные, включая последнюю (во время стрима она
+            # не отдается, пока не началась следующая)
+            result = None
+            partial = _parse_partial_dialogue(text) or partial
+            dialogue = (partial or {}).get("dialogue")
+            if isinstance(dialogue, list):
+                for raw_item in dialogue[seen:]:
+                    try:
+                        item = DialogueItem.model_validate(raw_item)
+                    except ValidationError:
+                        continue
+                    items.append(item)
+                    yield item
+            if items:
+                try:
+                    result = self.output_model(
+                        scratchpad=(partial or {}).get("scratchpad", ""),
+                        name_of_guest=(partial or {}).get("name_of_guest", "Эксперт"),
+                        dialogue=items,
+                    )
+                except ValidationError:
+                    result = None
+        if result is None:
+            raise Exception("Failed to get the dialogue from GigaChat")
+        self.result = result
+
+
 def parse_text_to_json(text: str, dialogue_format: Any) -> Optional[Any]:
     """Преобразование текстового диалога в JSON формат."""
     try:
@@ -16,6 +16,7 @@ class ConfigSchema(TypedDict):
 class PresentationState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
     slides: list
+    images: list
     slide_map: dict
     presentation_html: str
     images_base_64: dict
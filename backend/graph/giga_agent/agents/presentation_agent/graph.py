@@ -1,6 +1,5 @@
 import asyncio
 import json
-import os
 import uuid
 from typing import Annotated
 
@@ -9,14 +8,15 @@ from langgraph.constants import START, END
 from langgraph.graph import StateGraph
 from langgraph.graph.ui import push_ui_message
 from langgraph.prebuilt import InjectedState
-from langgraph_sdk import get_client
 
 from giga_agent.agents.presentation_agent.config import PresentationState, ConfigSchema
 from giga_agent.agents.presentation_agent.nodes.images import image_node
 from giga_agent.agents.presentation_agent.nodes.plan import plan_node
 from giga_agent.agents.presentation_agent.nodes.slides import slides_node
 from giga_agent.utils.env import load_project_env
+from giga_agent.utils.images import embed_images
 from giga_agent.utils.messages import filter_tool_calls
+from giga_agent.utils.subagents import run_subagent
 
 workflow = StateGraph(PresentationState, ConfigSchema)
 
@@ -43,44 +43,39 @@ async def generate_presentation(
     Args:
         presentation_task: Описание презентации
     """
-    client = get_client(url=os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024"))
-    thread = await client.threads.create()
-    thread_id = thread["thread_id"]
-    push_ui_message(
-        "agent_execution",
-        {
-            "agent": "generate_presentation",
-            "node": "__start__",
-        },
-    )
-    last_mes = filter_tool_calls(state["messages"][-1])
-    async for chunk in client.runs.stream(
-        thread_id=thread_id,
-        assistant_id="presentation",
-        input={
-            "messages": state["messages"][:-1] + [last_mes],
-            "task": presentation_task,
-        },
-        stream_mode=["values", "updates"],
-        on_disconnect="cancel",
-    ):
-        if chunk.event == "values":
-            state = chunk.data
-        elif chunk.event == "updates":
+    def on_custom(data):
+        if data.get("type") == "slide":
             push_ui_message(
                 "agent_execution",
                 {
                     "agent": "generate_presentation",
-                    "node": list(chunk.data.keys())[0],
+                    "node": "slides_node",
+                    "done": data["done"],
+                    "total": data["total"],
                 },
             )
-    code = state["presentation_html"]
-    for name, value in state.get("images_base_64", {}).items():
-        code = code.replace(name, f"data:image/jpeg;base64, {value}")
+
+    last_mes = filter_tool_calls(state["messages"][-1])
+    state = await run_subagent(
+        "generate_presentation",
+        "presentation",
+        graph,
+        {
+            "messages": state["messages"][:-1] + [last_mes],
+            "task": presentation_task,
+        },
+        on_custom=on_custom,
+    )
+    code, images = await embed_images(
+        state["presentation_html"],
+        state.get("images_base_64", {}),
+        {i["name"]: i.get("width") for i in state.get("images", [])},
+    )
     file_id = str(uuid.uuid4())
     return {
         "message": f'В результате выполнения была сгенерирована HTML страница {file_id}. Покажи её пользователю через "![HTML-страница](html:{file_id})" и напиши куда двигаться пользователю дальше',
         "giga_attachments": [{"type": "text/html", "file_id": file_id, "data": code}],
+        "giga_images": images,
     }
 
 
@@ -54,21 +54,18 @@ async def image_node(state: PresentationState, config: RunnableConfig):
     images = img_resp["json"]["images"]
     if config["configurable"].get("print_messages", False):
         img_resp["message"].pretty_print()
+    # Сами изображения генерируются в slides_node вместе со слайдами
+    return {"images": images}
+
+
+async def generate_image(image: dict, config: RunnableConfig) -> str:
+    """Генерирует изображение из плана и возвращает его в base64."""
     generator = load_image_gen()
     await generator.init()
-    tasks = [
-        generator.generate_image(i["description"], i["width"], i["height"])
-        for i in images
-    ]
-    images_data = await asyncio.gather(*tasks, return_exceptions=True)
-    slide_map = {}
-    images_base_64 = state.get("images_base_64", {})
-    for i, b in zip(images, images_data):
-        if isinstance(b, Exception):
-            continue
-        slide_map.setdefault(i["slide_index"], []).append(i)
-        images_base_64[i["name"]] = b
-        if config["configurable"].get("save_files", False):
-            with open(i["name"], "wb") as f:
-                await asyncio.to_thread(f.write, base64.b64decode(b))
-    return {"slide_map": slide_map, "images_base_64": images_base_64}
+    b = await generator.generate_image(
+        image["description"], image["width"], image["height"]
+    )
+    if config["configurable"].get("save_files", False):
+        with open(image["name"], "wb") as f:
+            await asyncio.to_thread(f.write, base64.b64decode(b))
+    return b
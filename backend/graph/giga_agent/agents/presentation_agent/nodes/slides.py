@@ -1,5 +1,6 @@
 import asyncio
 import os
+import random
 import re
 
 from langchain_core.runnables import (
@@ -7,57 +8,138 @@ from langchain_core.runnables import (
     RunnableParallel,
     RunnablePassthrough,
 )
+from langgraph.config import get_stream_writer
 
 from giga_agent.output_parsers.html_parser import HTMLParser
 from giga_agent.agents.presentation_agent.config import PresentationState, llm
+from giga_agent.agents.presentation_agent.nodes.images import generate_image
 from giga_agent.agents.presentation_agent.prompts.ru import SLIDE_PROMPT
+from giga_agent.utils.concurrency import AdaptiveLimiter
 
-slide_sem = asyncio.Semaphore(4)
+# Начальное и максимальное число слайдов, генерируемых одновременно.
+# При ответах 429 от провайдера лимит автоматически снижается
+SLIDES_PARALLEL = int(os.getenv("PRESENTATION_SLIDES_PARALLEL", 4))
+SLIDES_MAX_PARALLEL = int(os.getenv("PRESENTATION_SLIDES_MAX_PARALLEL", 8))
+SLIDE_ATTEMPTS = 3
+
+slide_limiter = AdaptiveLimiter(SLIDES_PARALLEL, max_limit=SLIDES_MAX_PARALLEL)
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
 with open(os.path.join(__location__, "presentation.html")) as f:
     presentation_html = f.read()
 
+PRESENTATION_HEAD, PRESENTATION_TAIL = presentation_html.split(
+    "<SECTIONS></SECTIONS>", 1
+)
+
 
 async def generate_slide(messages):
-    async with slide_sem:
-        ch_2 = (
-            SLIDE_PROMPT
-            | llm
-            | RunnableParallel({"message": RunnablePassthrough(), "html": HTMLParser()})
-        ).with_retry()
-        slide_resp = await ch_2.ainvoke({"messages": messages})
-        html = slide_resp.get("html", "")
-        reg = r",\s*"
-        html = re.sub(
-            r'data-background-gradient="linear-gradient\(([^)]*)\)"',
-            lambda m: f'data-background-gradient="linear-gradient({re.sub(reg, ", ", m.group(1))})"',
-            html,
-        )
-        return html
+    ch_2 = SLIDE_PROMPT | llm | RunnableParallel(
+        {"message": RunnablePassthrough(), "html": HTMLParser()}
+    )
+    for attempt in range(1, SLIDE_ATTEMPTS + 1):
+        try:
+            # Слот занимаем только на время запроса, а не на время ожидания повтора
+            async with slide_limiter:
+                slide_resp = await ch_2.ainvoke({"messages": messages})
+            break
+        except Exception:
+            if attempt == SLIDE_ATTEMPTS:
+                raise
+            await asyncio.sleep(min(2**attempt, 10) * random.uniform(0.5, 1.5))
+    html = slide_resp.get("html", "")
+    reg = r",\s*"
+    html = re.sub(
+        r'data-background-gradient="linear-gradient\(([^)]*)\)"',
+        lambda m: f'data-background-gradient="linear-gradient({re.sub(reg, ", ", m.group(1))})"',
+        html,
+    )
+    return html
+
+
+async def generate_indexed_slide(
+    idx, messages, user_message, graphs_message, images
+):
+    # Слайд с изображениями ждет только свои изображения
+    for image, image_task in images:
+        try:
+            await image_task
+        except Exception:
+            continue
+        user_message += f"\nУ тебя доступно изображение '{image.get('name')}' — '{image.get('description')}'. Помни, что это изображение не для фона! Используй его как контент. Помни про то, что нужен class='img' в теге img!"
+    user_message += graphs_message
+    return idx, await generate_slide(messages + [("user", user_message)])
 
 
 async def slides_node(state: PresentationState, config: RunnableConfig):
+    # Запускаем генерацию всех изображений сразу, параллельно со слайдами
+    image_tasks = []
+    slide_images = {}
+    for image in state.get("images", []):
+        image_task = asyncio.create_task(generate_image(image, config))
+        image_tasks.append((image, image_task))
+        slide_images.setdefault(image.get("slide_index"), []).append(
+            (image, image_task)
+        )
     slide_tasks = []
     uuid_pattern = (
         "^[0-9a-f]{8}-[0-9a-f]{4}-[0-5][0-9a-f]{3}-[089ab][0-9a-f]{3}-[0-9a-f]{12}$"
     )
     for idx, slide in enumerate(state["slides"]):
         user_message = f"Придумай {idx + 1} слайд '{slide.get('name')}'. Используй строго тот градиент, который указан в самом недавнем плане презентации! Всегда используй градиент типа 'to bottom'"
-        if (idx + 1) in state["slide_map"]:
-            images = state["slide_map"][(idx + 1)]
-            for image in images:
-                user_message += f"\nУ тебя доступно изображение '{image.get('name')}' — '{image.get('description')}'. Помни, что это изображение не для фона! Используй его как контент. Помни про то, что нужен class='img' в теге img!"
+        graphs_message = ""
         if slide.get("graphs", []):
             for graph in slide.get("graphs", []):
                 if not isinstance(graph, str):
                     continue
                 if graph.startswith("graph:"):
-                    user_message += f"\nИспользуй график: '{graph}'"
+                    graphs_message += f"\nИспользуй график: '{graph}'"
                 elif re.match(uuid_pattern, graph):
-                    user_message += f"\nИспользуй график: 'graph:{graph}'"
-        slide_tasks.append(generate_slide(state["messages"] + [("user", user_message)]))
-    slide_resps = await asyncio.gather(*slide_tasks)
-    result = presentation_html.replace("<SECTIONS></SECTIONS>", "\n".join(slide_resps))
-    return {"presentation_html": result}
+                    graphs_message += f"\nИспользуй график: 'graph:{graph}'"
+        slide_tasks.append(
+            asyncio.create_task(
+                generate_indexed_slide(
+                    idx,
+                    state["messages"],
+                    user_message,
+                    graphs_message,
+                    slide_images.get(idx + 1, []),
+                )
+            )
+        )
+    # Отдаем слайды по мере готовности, а не после самого медленного
+    writer = get_stream_writer()
+    sections = [""] * len(slide_tasks)
+    try:
+        for done, future in enumerate(asyncio.as_completed(slide_tasks), start=1):
+            idx, html = await future
+            sections[idx] = html
+            writer(
+                {
+                    "type": "slide",
+                    "index": idx,
+                    "done": done,
+                    "total": len(slide_tasks),
+                    "html": html,
+                }
+            )
+        images_data = await asyncio.gather(
+            *(image_task for _, image_task in image_tasks), return_exceptions=True
+        )
+    finally:
+        for task in slide_tasks + [image_task for _, image_task in image_tasks]:
+            task.cancel()
+    slide_map = {}
+    images_base_64 = state.get("images_base_64", {})
+    for (image, _), b in zip(image_tasks, images_data):
+        if isinstance(b, Exception):
+            continue
+        slide_map.setdefault(image["slide_index"], []).append(image)
+        images_base_64[image["name"]] = b
+    result = PRESENTATION_HEAD + "\n".join(sections) + PRESENTATION_TAIL
+    return {
+        "presentation_html": result,
+        "slide_map": slide_map,
+        "images_base_64": images_base_64,
+    }
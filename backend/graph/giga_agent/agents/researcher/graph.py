@@ -1,16 +1,14 @@
 import asyncio
-import os
 from typing import Annotated, Literal
 
 from deepagents import async_create_deep_agent
 from langchain_core.tools import tool
 from langchain_tavily import TavilySearch
-from langgraph.graph.ui import push_ui_message
 from langgraph.prebuilt import InjectedState
-from langgraph_sdk import get_client
 
 from giga_agent.utils.llm import load_llm
 from giga_agent.utils.messages import filter_tool_calls
+from giga_agent.utils.subagents import run_subagent
 
 llm = load_llm().bind(timeout=600).with_config(tags=["nostream"])
 
@@ -179,48 +177,18 @@ async def researcher_agent(
     """Проводит исследование и создает на его основе отчёт по запросу пользователя"""
 
     last_mes = filter_tool_calls(state["messages"][-1])
-    client = get_client(url=os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024"))
-    thread = await client.threads.create()
-    thread_id = thread["thread_id"]
-    push_ui_message(
-        "agent_execution",
+    result_state = await run_subagent(
+        "researcher_agent",
+        "researcher",
+        agent,
         {
-            "agent": "researcher_agent",
-            "node": "__start__",
-        },
-    )
-
-    result_state = {}
-    async for chunk in client.runs.stream(
-        thread_id=thread_id,
-        assistant_id="researcher",
-        input={"messages": state["messages"][:-1]
+            "messages": state["messages"][:-1]
             + [
                 last_mes,
-                (
-                    "user",
-                    question
-                ),
+                ("user", question),
             ],
-               },
-        stream_mode=["values", "updates"],
-        on_disconnect="cancel",
-        config={
-            "configurable": {
-                "thread_id": thread_id
-            }
         },
-    ):
-        if chunk.event == "values":
-            result_state = chunk.data
-        elif chunk.event == "updates":
-            push_ui_message(
-                "agent_execution",
-                {
-                    "agent": "researcher_agent",
-                    "node": list(chunk.data.keys())[0],
-                },
-            )
+    )
     if "files" in result_state:
         if "final_report.md" in result_state["files"]:
             final_report = result_state["files"]["final_report.md"]
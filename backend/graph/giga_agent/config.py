@@ -15,6 +15,7 @@ from giga_agent.agents.researcher.graph import researcher_agent
 from giga_agent.repl_tools.llm import summarize
 from giga_agent.repl_tools.sentiment import get_embeddings, predict_sentiments
 from giga_agent.tools.another import ask_about_image, gen_image, search
+from giga_agent.tools.cve import get_cve_for_packages
 from giga_agent.tools.github import (
     get_pull_request,
     get_workflow_runs,
@@ -100,6 +101,8 @@ SERVICE_TOOLS = [
     get_workflow_runs,
     list_pull_requests,
     get_pull_request,
+    # CVE
+    get_cve_for_packages,
 ]
 
 AGENTS = [
@@ -1,17 +1,28 @@
 from __future__ import annotations
 
 import os
-from typing import Tuple
+from typing import Dict, Tuple
 
-from giga_agent.generators.image.image_gen import ImageGen
+from giga_agent.generators.image.image_gen import (
+    ImageGen,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW,
+    image_gen_limiter,
+)
 from giga_agent.generators.image.openai import OpenAIImageGen
 from giga_agent.generators.image.gigachat import GigaChatImageGen
 from giga_agent.generators.image.fusion_brain import FusionBrainImageGen
 
+# Singletons cache: один генератор (и один HTTP-клиент) на "provider:model"
+_IMAGE_GEN_SINGLETONS: Dict[str, ImageGen] = {}
+
 
 def load_image_gen(name: str = None) -> ImageGen:
-    """Загружает и инициализирует генератор изображений по строке формата
-    "provider:model".
+    """Загружает генератор изображений по строке формата "provider:model".
+
+    Генератор создается один раз на процесс; `init()` у него идемпотентен,
+    поэтому вызывающий код по-прежнему может вызывать его перед генерацией.
 
     Примеры:
     - "openai:dall-e-3" → OpenAIImageGen(model="dall-e-3")
@@ -25,6 +36,8 @@ def load_image_gen(name: str = None) -> ImageGen:
         raise ValueError(
             "Specify the image provider in the IMAGE_GEN_NAME environment variable"
         )
+    if name in _IMAGE_GEN_SINGLETONS:
+        return _IMAGE_GEN_SINGLETONS[name]
     provider, model = _parse_name(name)
 
     if provider == "openai":
@@ -39,9 +52,22 @@ def load_image_gen(name: str = None) -> ImageGen:
             f"Expected: openai, gigachat, fusion_brain"
         )
 
+    _IMAGE_GEN_SINGLETONS[name] = gen
     return gen
 
 
+def get_image_gen_metrics() -> dict:
+    """Загрузка общего ограничителя генерации: в работе и в очереди."""
+    return image_gen_limiter.metrics()
+
+
+async def close_image_gens() -> None:
+    """Закрывает клиенты всех созданных генераторов."""
+    for gen in _IMAGE_GEN_SINGLETONS.values():
+        await gen.aclose()
+    _IMAGE_GEN_SINGLETONS.clear()
+
+
 def _parse_name(name: str) -> Tuple[str, str]:
     if ":" not in name:
         raise ValueError(
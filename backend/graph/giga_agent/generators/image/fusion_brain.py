@@ -1,11 +1,169 @@
-from typing import Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
 
 import os
 import json
+import time
 import asyncio
+import hashlib
 import httpx
 
 from giga_agent.generators.image.image_gen import ImageGen
+from giga_agent.utils.concurrency import PriorityLimiter
+
+# Максимальное время ожидания одной генерации, в секундах
+KANDINSKY_TIMEOUT = float(os.getenv("KANDINSKY_TIMEOUT", 300))
+# Интервалы опроса статуса, пока нет статистики по времени генерации
+KANDINSKY_FIRST_POLL = 2.0
+KANDINSKY_MIN_POLL = 0.5
+KANDINSKY_MAX_POLL = 5.0
+# Сколько ошибок запроса статуса подряд допускаем для одной задачи
+KANDINSKY_POLL_ERRORS = 3
+
+# id пайплайна по ключу API: общий для всех экземпляров клиента
+_PIPELINE_IDS: Dict[str, str] = {}
+_PIPELINE_LOCK = asyncio.Lock()
+
+
+@dataclass
+class _KandinskyJob:
+    client: httpx.AsyncClient
+    request_id: str
+    future: asyncio.Future
+    started: float
+    next_check: float = 0.0
+    errors: int = field(default=0)
+
+
+class KandinskyStatusPoller:
+    """Общий опрос статусов генераций Kandinsky.
+
+    Все незавершенные задачи процесса опрашиваются одним фоновым циклом.
+    Момент следующей проверки выбирается по перцентилям уже наблюдавшихся
+    времен генерации: пока задача младше p25/p50/p75/p90, проверяем ровно
+    в эти моменты, дальше — с шагом в четверть p90.
+    """
+
+    def __init__(self, history_size: int = 200) -> None:
+        self._jobs: Dict[str, _KandinskyJob] = {}
+        self._durations = deque(maxlen=history_size)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def track(self, client: httpx.AsyncClient, request_id: str) -> asyncio.Future:
+        """Ставит задачу на отслеживание и возвращает future со списком файлов."""
+        now = time.monotonic()
+        job = _KandinskyJob(
+            client=client,
+            request_id=request_id,
+            future=asyncio.get_running_loop().create_future(),
+            started=now,
+        )
+        job.next_check = now + self._next_delay(0.0)
+        self._jobs[request_id] = job
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return job.future
+
+    def _percentiles(self) -> list[float]:
+        if len(self._durations) < 5:
+            return []
+        durations = sorted(self._durations)
+        return [
+            durations[min(len(durations) - 1, int(q * len(durations)))]
+            for q in (0.25, 0.5, 0.75, 0.9)
+        ]
+
+    def _next_delay(self, age: float) -> float:
+        percentiles = self._percentiles()
+        if not percentiles:
+            if age == 0:
+                return KANDINSKY_FIRST_POLL
+            return min(KANDINSKY_MAX_POLL, max(KANDINSKY_MIN_POLL, age * 0.5))
+        for target in percentiles:
+            if target - age >= KANDINSKY_MIN_POLL:
+                return target - age
+        return min(KANDINSKY_MAX_POLL, max(KANDINSKY_MIN_POLL, percentiles[-1] / 4))
+
+    async def _run(self) -> None:
+        while self._jobs:
+            now = time.monotonic()
+            due = [job for job in self._jobs.values() if job.next_check <= now]
+            if due:
+                await asyncio.gather(*(self._check(job) for job in due))
+            if not self._jobs:
+                break
+            delay = min(job.next_check for job in self._jobs.values())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), max(0.0, delay - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def _finish(self, job: _KandinskyJob) -> None:
+        self._jobs.pop(job.request_id, None)
+
+    async def _check(self, job: _KandinskyJob) -> None:
+        try:
+            await self._check_job(job)
+        except Exception as e:
+            # Цикл опроса общий, поэтому ошибка одной задачи не должна его ронять
+            self._finish(job)
+            if not job.future.done():
+                job.future.set_exception(e)
+
+    async def _check_job(self, job: _KandinskyJob) -> None:
+        if job.future.done():
+            # Ожидающий отменил генерацию
+            self._finish(job)
+            return
+        try:
+            resp = await job.client.get(
+                f"key/api/v1/pipeline/status/{job.request_id}"
+            )
+            resp.raise_for_status()
+            data = resp.json()
+        except (httpx.HTTPError, ValueError) as e:
+            job.errors += 1
+            if job.errors >= KANDINSKY_POLL_ERRORS:
+                self._finish(job)
+                job.future.set_exception(e)
+                return
+            data = {}
+        else:
+            job.errors = 0
+
+        now = time.monotonic()
+        age = now - job.started
+        status = data.get("status")
+        if status == "DONE":
+            self._durations.append(age)
+            self._finish(job)
+            job.future.set_result(data["result"]["files"])
+        elif status == "FAIL":
+            self._finish(job)
+            job.future.set_exception(
+                RuntimeError(
+                    f"Kandinsky generation failed: "
+                    f"{data.get('errorDescription', 'Unknown error')}"
+                )
+            )
+        elif age >= KANDINSKY_TIMEOUT:
+            self._finish(job)
+            job.future.set_exception(TimeoutError("Kandinsky generation timed out"))
+        else:
+            job.next_check = now + self._next_delay(age)
+
+
+kandinsky_poller = KandinskyStatusPoller()
 
 
 class AsyncKandinskyAPI:
@@ -21,20 +179,22 @@ class AsyncKandinskyAPI:
             "X-Key": f"Key {self.api_key}",
             "X-Secret": f"Secret {self.secret_key}",
         }
-        self._pipeline_id = None
+        self._pipeline_key = hashlib.sha256(self.api_key.encode("utf-8")).hexdigest()
         self.client = httpx.AsyncClient(
             base_url=self.base_url, headers=self.auth_headers
         )
 
     async def get_pipeline(self) -> str:
-        if self._pipeline_id:
-            return self._pipeline_id
+        if self._pipeline_key in _PIPELINE_IDS:
+            return _PIPELINE_IDS[self._pipeline_key]
 
-        resp = await self.client.get("key/api/v1/pipelines")
-        resp.raise_for_status()
-        data = resp.json()
-        self._pipeline_id = data[0]["id"]
-        return self._pipeline_id
+        async with _PIPELINE_LOCK:
+            if self._pipeline_key not in _PIPELINE_IDS:
+                resp = await self.client.get("key/api/v1/pipelines")
+                resp.raise_for_status()
+                data = resp.json()
+                _PIPELINE_IDS[self._pipeline_key] = data[0]["id"]
+        return _PIPELINE_IDS[self._pipeline_key]
 
     async def generate(
         self,
@@ -64,26 +224,12 @@ class AsyncKandinskyAPI:
         resp.raise_for_status()
         return resp.json()["uuid"]
 
-    async def check_generation(
-        self, request_id: str, attempts: int = 10, delay: float = 5.0
-    ) -> list[str]:
-        for _ in range(attempts):
-            resp = await self.client.get(f"key/api/v1/pipeline/status/{request_id}")
-            resp.raise_for_status()
-            data = resp.json()
-
-            status = data.get("status")
-            if status == "DONE":
-                return data["result"]["files"]
-            elif status == "FAIL":
-                raise RuntimeError(
-                    f"Kandinsky generation failed: "
-                    f"{data.get('errorDescription', 'Unknown error')}"
-                )
-
-            await asyncio.sleep(delay)
-
-        raise TimeoutError("Kandinsky generation timed out")
+    async def check_generation(self, request_id: str) -> list[str]:
+        future = kandinsky_poller.track(self.client, request_id)
+        try:
+            return await future
+        finally:
+            future.cancel()
 
     async def generate_and_get_image(
         self,
@@ -100,14 +246,20 @@ class AsyncKandinskyAPI:
 class FusionBrainImageGen(ImageGen):
     """Генерация через FusionBrain (Kandinsky API)."""
 
+    provider = "fusion_brain"
+
     def __init__(
-        self, model: str, semaphore: Optional[asyncio.Semaphore] = None
+        self, model: str, limiter: Optional[PriorityLimiter] = None
     ) -> None:
-        super().__init__(model=model, semaphore=semaphore)
+        super().__init__(model=model, limiter=limiter)
         self._api = AsyncKandinskyAPI()
 
-    async def init(self) -> None:
-        await super().init()
+    async def _init(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        await self._api.client.aclose()
+        await super().aclose()
 
     async def _generate_image(self, prompt: str, width: int, height: int) -> str:
         files = await self._api.generate_and_get_image(
@@ -5,6 +5,7 @@ from typing import Optional
 import httpx
 
 from giga_agent.generators.image.image_gen import ImageGen
+from giga_agent.utils.concurrency import PriorityLimiter
 from giga_agent.utils.llm import load_gigachat
 
 
@@ -17,32 +18,40 @@ class CensorException(Exception):
 class GigaChatImageGen(ImageGen):
     """Генерация через GigaChat Devices API."""
 
+    provider = "gigachat"
+
     def __init__(
         self,
         model: str,
-        semaphore: Optional[asyncio.Semaphore] = None,
+        limiter: Optional[PriorityLimiter] = None,
         *,
         token: Optional[str] = None,
         timeout: float | None = 60.0,
         max_retries: int = 3,
     ) -> None:
-        super().__init__(model=model, semaphore=semaphore)
+        super().__init__(model=model, limiter=limiter)
         self._token: Optional[str] = token
         self._timeout = timeout
         self._max_retries = max_retries
         self._client = None
+        self._llm = None
 
-    async def init(self) -> None:
-        llm = load_gigachat()
+    async def _init(self) -> None:
+        self._llm = load_gigachat()
 
         self._client = httpx.AsyncClient(
             verify=False,
             timeout=self._timeout,
-            base_url=llm._client._client.base_url,
+            base_url=self._llm._client._client.base_url,
         )
         if self._token is None:
-            self._token = (await llm._client.aget_token()).access_token
-        await super().init()
+            self._token = (await self._llm._client.aget_token()).access_token
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await super().aclose()
 
     async def _generate_image(self, prompt: str, width: int, height: int) -> str:
         if self._client is None or self._token is None:
@@ -57,14 +66,13 @@ class GigaChatImageGen(ImageGen):
             },
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self._token}",
-        }
-
         attempt = 0
         while True:
             attempt += 1
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {self._token}",
+            }
             resp = await self._client.post(
                 "/image/generate",
                 json=payload,
@@ -74,6 +82,10 @@ class GigaChatImageGen(ImageGen):
             if resp.status_code in [451]:
                 raise CensorException("Server returned HTTP 451 — access restricted.")
 
+            # Генератор живет весь процесс, поэтому токен может истечь
+            if resp.status_code == 401 and self._llm is not None:
+                self._token = (await self._llm._client.aget_token()).access_token
+
             if resp.is_success:
                 return base64.b64encode(resp.content).decode("ascii")
 
@@ -1,44 +1,188 @@
 import abc
 import asyncio
+import base64
 import os
-from typing import Optional
+import unicodedata
+from typing import List, Optional, Sequence, Tuple, Union
+
+from giga_agent.utils.cache import DiskLRUCache, make_cache_key
+from giga_agent.utils.concurrency import PriorityLimiter, TokenBucket
+from giga_agent.utils.env import load_project_env
+
+load_project_env()
+
+# Приоритеты запросов генерации: меньше — раньше.
+# Пользователь ждет одно изображение — PRIORITY_HIGH,
+# пакетная генерация для страниц — PRIORITY_NORMAL / PRIORITY_LOW
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+IMAGE_GEN_PARALLEL = int(os.getenv("IMAGE_GEN_PARALLEL", 1))
+# Ограничение частоты запросов к провайдеру в минуту, 0 — без ограничения
+IMAGE_GEN_RPM = float(os.getenv("IMAGE_GEN_RPM", 0))
+
+# Общий для всех генераторов процесса ограничитель
+image_gen_limiter = PriorityLimiter(
+    IMAGE_GEN_PARALLEL,
+    bucket=TokenBucket(IMAGE_GEN_RPM / 60) if IMAGE_GEN_RPM > 0 else None,
+)
+
+# Кэш сгенерированных изображений, по умолчанию выключен (0 МБ)
+IMAGE_GEN_CACHE_DIR = os.getenv("IMAGE_GEN_CACHE_DIR", "cache/images")
+IMAGE_GEN_CACHE_MAX_MB = int(os.getenv("IMAGE_GEN_CACHE_MAX_MB", 0))
+
+image_cache = DiskLRUCache(IMAGE_GEN_CACHE_DIR, IMAGE_GEN_CACHE_MAX_MB * 1024 * 1024)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Приводит промпт к каноничному виду: NFC и схлопнутые пробелы."""
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
 
 
 class ImageGen(abc.ABC):
     """Базовый генератор изображений.
 
-    - Принимает `semaphore` ограничивающий вызовы `generate_image`.
+    - Принимает `limiter` ограничивающий вызовы `generate_image`
+      (по умолчанию общий для процесса `image_gen_limiter`).
+    - `init()` идемпотентен: ресурсы готовятся в `_init` один раз.
+    - Если включен кэш (IMAGE_GEN_CACHE_MAX_MB), одинаковые запросы
+      отдаются с диска без обращения к провайдеру.
     """
 
-    def __init__(
-        self, model: str, semaphore: Optional[asyncio.Semaphore] = None
-    ) -> None:
+    provider: str = ""
+    # Сколько изображений одного промпта провайдер отдает за один запрос
+    max_batch_size: int = 1
+
+    def __init__(self, model: str, limiter: Optional[PriorityLimiter] = None) -> None:
         self.model = model
-        self.semaphore: asyncio.Semaphore = semaphore or asyncio.Semaphore(
-            int(os.getenv("IMAGE_GEN_PARALLEL", 1))
-        )
+        self.limiter: PriorityLimiter = limiter or image_gen_limiter
         self._initialized: bool = False
+        self._init_lock = asyncio.Lock()
 
-    @abc.abstractmethod
     async def init(self) -> None:
         """Подготовка ресурсов перед генерацией изображений."""
-        self._initialized = True
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if not self._initialized:
+                await self._init()
+                self._initialized = True
+
+    @abc.abstractmethod
+    async def _init(self) -> None:  # pragma: no cover - интерфейс
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Освобождает ресурсы генератора."""
+        self._initialized = False
 
-    async def generate_image(self, prompt: str, width: int, height: int) -> str:
-        """Обёртка, обеспечивающая ограничение семафором.
+    async def generate_image(
+        self,
+        prompt: str,
+        width: int,
+        height: int,
+        priority: int = PRIORITY_NORMAL,
+        variation: bool = False,
+    ) -> str:
+        """Обёртка, обеспечивающая кэш и ограничение общим лимитером.
 
         Реализацию генерации предоставляет `_generate_image` в наследниках.
+        `variation=True` — нужен новый вариант изображения, кэш не используется.
         Возвращает base64-строку изображения.
         """
         if not self._initialized:
             raise RuntimeError(
                 "ImageGen.init() must be called before generate_image()."
             )
-        async with self.semaphore:
-            return await self._generate_image(prompt, width, height)
+        cache_key = None
+        if image_cache.enabled and not variation:
+            cache_key = make_cache_key(
+                self.provider, self.model, normalize_prompt(prompt), width, height
+            )
+            cached = await image_cache.aget(cache_key)
+            if cached is not None:
+                return base64.b64encode(cached).decode("ascii")
+        async with self.limiter.slot(priority):
+            image = await self._generate_image(prompt, width, height)
+        if cache_key is not None:
+            await image_cache.aset(cache_key, base64.b64decode(image))
+        return image
+
+    async def generate_images(
+        self,
+        requests: Sequence[Tuple[str, int, int]],
+        priority: int = PRIORITY_NORMAL,
+    ) -> List[Union[str, Exception]]:
+        """Генерирует несколько изображений по списку (prompt, width, height).
+
+        Одинаковые запросы объединяются в один запрос на несколько изображений,
+        если провайдер это поддерживает (`max_batch_size` > 1), остальные
+        выполняются параллельно в пределах общего лимитера. Возвращает
+        результаты в исходном порядке; ошибка возвращается вместо изображения,
+        как в `asyncio.gather(..., return_exceptions=True)`.
+        """
+        groups = {}
+        for idx, (prompt, width, height) in enumerate(requests):
+            key = (normalize_prompt(prompt), width, height)
+            groups.setdefault(key, []).append(idx)
+
+        jobs = []
+        for (prompt, width, height), indexes in groups.items():
+            if len(indexes) == 1 or self.max_batch_size == 1:
+                # Повторы одного промпта должны давать разные изображения
+                for n, idx in enumerate(indexes):
+                    jobs.append(
+                        (
+                            [idx],
+                            self.generate_image(
+                                prompt, width, height, priority, variation=n > 0
+                            ),
+                        )
+                    )
+                continue
+            for start in range(0, len(indexes), self.max_batch_size):
+                batch = indexes[start : start + self.max_batch_size]
+                job = self._generate_batch(prompt, width, height, len(batch), priority)
+                jobs.append((batch, job))
+
+        results: List[Union[str, Exception]] = [None] * len(requests)
+        outputs = await asyncio.gather(
+            *(job for _, job in jobs), return_exceptions=True
+        )
+        for (indexes, _), output in zip(jobs, outputs):
+            if isinstance(output, Exception):
+                output = [output] * len(indexes)
+            elif len(indexes) == 1:
+                output = [output]
+            for idx, image in zip(indexes, output):
+                results[idx] = image
+        return results
+
+    async def _generate_batch(
+        self, prompt: str, width: int, height: int, n: int, priority: int
+    ) -> List[str]:
+        if not self._initialized:
+            raise RuntimeError(
+                "ImageGen.init() must be called before generate_images()."
+            )
+        async with self.limiter.slot(priority):
+            images = await self._generate_images(prompt, width, height, n)
+        if len(images) < n:
+            raise RuntimeError(f"Provider returned {len(images)} of {n} images")
+        return images
 
     @abc.abstractmethod
     async def _generate_image(
         self, prompt: str, width: int, height: int
     ) -> str:  # pragma: no cover - интерфейс
         raise NotImplementedError
+
+    async def _generate_images(
+        self, prompt: str, width: int, height: int, n: int
+    ) -> List[str]:
+        """Генерирует `n` изображений одного промпта одним запросом.
+
+        Переопределяется провайдерами с `max_batch_size` > 1.
+        """
+        raise NotImplementedError
@@ -1,10 +1,11 @@
 import asyncio
-from typing import Optional
+from typing import List, Optional
 
 import os
 import httpx
 
 from giga_agent.generators.image.image_gen import ImageGen
+from giga_agent.utils.concurrency import PriorityLimiter
 
 # Поддерживаемые размеры для моделей OpenAI Images
 # Ключи — подстроки, ожидаемые в имени модели (в нижнем регистре)
@@ -29,6 +30,13 @@ SUPPORTED_IMAGE_SIZES: dict[str, list[tuple[int, int]]] = {
     ],
 }
 
+# Максимальное число изображений (параметр n) в одном запросе
+MAX_IMAGES_PER_REQUEST: dict[str, int] = {
+    "dall-e-3": 1,
+    "gpt-image-1": 10,
+    "dall-e-2": 10,
+}
+
 
 class OpenAIImageGen(ImageGen):
     """Генерация изображений через OpenAI Images (DALL·E).
@@ -37,17 +45,19 @@ class OpenAIImageGen(ImageGen):
     базового класса `ImageGen`.
     """
 
+    provider = "openai"
+
     def __init__(
         self,
         model: str = "dall-e-3",
-        semaphore: Optional[asyncio.Semaphore] = None,
+        limiter: Optional[PriorityLimiter] = None,
         *,
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
         timeout: float | None = 60.0,
         max_retries: int = 3,
     ) -> None:
-        super().__init__(model=model, semaphore=semaphore)
+        super().__init__(model=model, limiter=limiter)
         self._api_key: Optional[str] = api_key or os.getenv("OPENAI_API_KEY")
         self._base_url = (
             base_url
@@ -57,8 +67,12 @@ class OpenAIImageGen(ImageGen):
         self._timeout = timeout
         self._max_retries = max_retries
         self._client: Optional[httpx.AsyncClient] = None
+        self.max_batch_size = next(
+            (n for key, n in MAX_IMAGES_PER_REQUEST.items() if key in model.lower()),
+            1,
+        )
 
-    async def init(self) -> None:
+    async def _init(self) -> None:
         if not self._api_key:
             raise ValueError(
                 "OPENAI_API_KEY is not set in the environment and was not provided to the constructor"
@@ -67,9 +81,19 @@ class OpenAIImageGen(ImageGen):
             base_url=self._base_url,
             timeout=self._timeout,
         )
-        await super().init()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await super().aclose()
 
     async def _generate_image(self, prompt: str, width: int, height: int) -> str:
+        return (await self._generate_images(prompt, width, height, 1))[0]
+
+    async def _generate_images(
+        self, prompt: str, width: int, height: int, n: int
+    ) -> List[str]:
         if self._client is None or not self._api_key:
             raise RuntimeError("OpenAIImageGen is not initialized. Call init().")
 
@@ -80,7 +104,7 @@ class OpenAIImageGen(ImageGen):
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "n": 1,
+            "n": n,
             "size": size,
             "response_format": "b64_json",
             # Дополнительно можно управлять качеством/стилем (актуально для dall-e-3):
@@ -108,10 +132,10 @@ class OpenAIImageGen(ImageGen):
                 images = data.get("data", [])
                 if not images:
                     raise RuntimeError("OpenAI did not return image data")
-                b64 = images[0].get("b64_json")
-                if not b64:
+                b64_images = [image.get("b64_json") for image in images]
+                if not all(b64_images):
                     raise RuntimeError("OpenAI response does not contain b64_json")
-                return b64
+                return b64_images
 
             # На последней попытке — пробрасываем исключение
             if attempt >= self._max_retries:
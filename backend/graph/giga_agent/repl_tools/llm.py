@@ -1,6 +1,66 @@
+import asyncio
+import os
+from typing import List
+
 from langchain_core.output_parsers.json import JsonOutputParser
 
-from giga_agent.utils.llm import load_llm
+from giga_agent.utils.cache import DiskLRUCache, make_cache_key
+from giga_agent.utils.concurrency import AdaptiveLimiter
+from giga_agent.utils.llm import get_agent_env, load_llm
+from giga_agent.utils.progress import report_progress
+
+# Бюджет токенов на один запрос суммаризации (тексты + промпт)
+SUMMARIZE_CHUNK_TOKENS = int(os.getenv("SUMMARIZE_CHUNK_TOKENS", 6000))
+SUMMARIZE_PARALLEL = int(os.getenv("SUMMARIZE_PARALLEL", 4))
+SUMMARIZE_MAX_PARALLEL = int(os.getenv("SUMMARIZE_MAX_PARALLEL", 8))
+# Кэш частичных саммари по хэшу чанка. SUMMARIZE_CACHE_MAX_MB=0 отключает кэш
+SUMMARIZE_CACHE_DIR = os.getenv("SUMMARIZE_CACHE_DIR", "cache/summaries")
+SUMMARIZE_CACHE_MAX_MB = int(os.getenv("SUMMARIZE_CACHE_MAX_MB", 64))
+
+# Грубая оценка без токенизатора: для русского текста ~3 символа на токен
+CHARS_PER_TOKEN = 3
+TEXTS_SEPARATOR = "\n----\n"
+
+summarize_limiter = AdaptiveLimiter(
+    SUMMARIZE_PARALLEL, max_limit=SUMMARIZE_MAX_PARALLEL
+)
+summary_cache = DiskLRUCache(SUMMARIZE_CACHE_DIR, SUMMARIZE_CACHE_MAX_MB * 1024 * 1024)
+
+MAP_PROMPT = """Кратко перескажи тексты ниже. Сохрани все важные факты, мнения, цифры и имена, ничего не добавляй от себя.
+{texts}"""
+REDUCE_PROMPT = """Ниже частичные саммари фрагментов одного набора текстов. Объедини их в одно саммари без повторов, сохранив все важные факты.
+{texts}"""
+
+
+def chunk_texts(texts: List[str], max_tokens: int) -> List[str]:
+    """Склеивает тексты в чанки не больше `max_tokens` токенов;
+    слишком длинный текст режется на части."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for text in texts:
+        for start in range(0, max(len(text), 1), max_chars):
+            part = text[start : start + max_chars]
+            if current and size + len(part) + len(TEXTS_SEPARATOR) > max_chars:
+                chunks.append(TEXTS_SEPARATOR.join(current))
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + len(TEXTS_SEPARATOR)
+    if current:
+        chunks.append(TEXTS_SEPARATOR.join(current))
+    return chunks
+
+
+async def summarize_chunk(prompt: str, chunk: str) -> str:
+    """Саммари одного чанка; результат кэшируется по модели, промпту и чанку."""
+    cache_key = make_cache_key(os.getenv(get_agent_env("fast")), prompt, chunk)
+    cached = await summary_cache.aget(cache_key)
+    if cached is not None:
+        return cached.decode("utf-8")
+    llm = load_llm(tag="fast")
+    async with summarize_limiter:
+        summary = (await llm.ainvoke([("system", prompt.format(texts=chunk))])).content
+    await summary_cache.aset(cache_key, summary.encode("utf-8"))
+    return summary
 
 
 async def summarize(texts: list[str], addition: str = "") -> str:
@@ -14,7 +74,28 @@ async def summarize(texts: list[str], addition: str = "") -> str:
     llm = load_llm(tag="fast")
     if addition:
         addition = f"\nОбрати особое внимание на {addition}\n"
-    texts = "\n----\n".join(texts)
+    budget = SUMMARIZE_CHUNK_TOKENS - len(MAP_PROMPT) // CHARS_PER_TOKEN
+    chunks = chunk_texts(texts, budget)
+    # Map, затем иерархический reduce, пока все не уместится в один запрос.
+    # chunk_texts не выпускает чанков больше бюджета, поэтому последний
+    # оставшийся чанк всегда помещается в финальный запрос.
+    # Промежуточные саммари не зависят от `addition` и берутся из кэша
+    level = 0
+    while len(chunks) > 1:
+        prompt = MAP_PROMPT if level == 0 else REDUCE_PROMPT
+        report_progress(f"Суммаризация: уровень {level + 1}, чанков {len(chunks)}")
+        summaries = await asyncio.gather(
+            *(summarize_chunk(prompt, chunk) for chunk in chunks)
+        )
+        next_chunks = chunk_texts(summaries, budget)
+        if len(next_chunks) >= len(chunks):
+            # Саммари не стали короче: обрезаем их до половины бюджета, чтобы
+            # в каждый чанк поместилось хотя бы два и уровни сходились
+            half = budget * CHARS_PER_TOKEN // 2 - len(TEXTS_SEPARATOR)
+            next_chunks = chunk_texts([s[:half] for s in summaries], budget)
+        chunks = next_chunks
+        level += 1
+    texts = chunks[0] if chunks else ""
     return (
         await llm.ainvoke(
             [("system", f"""Суммаризируй текста ниже{addition}\n{texts}""")]
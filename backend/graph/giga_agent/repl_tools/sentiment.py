@@ -1,9 +1,19 @@
+import asyncio
 import os
+import threading
+import time
 
 import joblib
 import numpy as np
 
-from giga_agent.utils.llm import load_embeddings
+from giga_agent.utils.cache import make_cache_key
+from giga_agent.utils.embeddings import embed_texts
+from giga_agent.utils.progress import report_progress
+
+# С какого числа текстов predict_proba выполняется в отдельном потоке
+SENTIMENT_THREAD_MIN_TEXTS = int(os.getenv("SENTIMENT_THREAD_MIN_TEXTS", 1000))
+# Несжатая копия модели для загрузки через mmap, пустое значение — без копии
+SENTIMENT_MODEL_CACHE_DIR = os.getenv("SENTIMENT_MODEL_CACHE_DIR", "cache/models")
 
 
 def probs_to_labels(probas, classes):
@@ -17,13 +27,58 @@ def probs_to_labels(probas, classes):
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
-clf = joblib.load(
-    os.path.join(
-        __location__,
-        os.getenv("GIGA_AGENT_SENTIMENT_MODEL", "models/sentiment_gigachat.joblib"),
-    )
+SENTIMENT_MODEL_PATH = os.path.join(
+    __location__,
+    os.getenv("GIGA_AGENT_SENTIMENT_MODEL", "models/sentiment_gigachat.joblib"),
 )
 
+_CLASSIFIER = None
+_CLASSIFIER_LOCK = threading.Lock()
+
+
+def load_classifier():
+    """Загружает модель с `mmap_mode="r"`: массивы отображаются в память
+    только для чтения, и процессы-воркеры делят одни и те же страницы.
+
+    Модели в репозитории сжаты, а сжатый файл через mmap не читается,
+    поэтому при первой загрузке несжатая копия сохраняется в кэш.
+    """
+    if not SENTIMENT_MODEL_CACHE_DIR:
+        return joblib.load(SENTIMENT_MODEL_PATH)
+    stat = os.stat(SENTIMENT_MODEL_PATH)
+    key = make_cache_key(SENTIMENT_MODEL_PATH, stat.st_size, stat.st_mtime)
+    path = os.path.join(SENTIMENT_MODEL_CACHE_DIR, f"sentiment-{key[:16]}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path, mmap_mode="r")
+    clf = joblib.load(SENTIMENT_MODEL_PATH)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(SENTIMENT_MODEL_CACHE_DIR, exist_ok=True)
+        joblib.dump(clf, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Без копии модель просто не делится между процессами
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return clf
+
+
+def get_classifier():
+    """Классификатор настроений, загружается при первом вызове."""
+    global _CLASSIFIER
+    with _CLASSIFIER_LOCK:
+        if _CLASSIFIER is None:
+            start = time.perf_counter()
+            _CLASSIFIER = load_classifier()
+            elapsed = time.perf_counter() - start
+            report_progress(f"Модель настроений загружена за {elapsed:.2f} с")
+    return _CLASSIFIER
+
+
+def predict_labels(X: np.ndarray) -> list[str]:
+    clf = get_classifier()
+    return list(probs_to_labels(clf.predict_proba(X), clf.classes_))
+
 
 async def predict_sentiments(texts: list[str]) -> list[str]:
     """
@@ -35,10 +90,11 @@ async def predict_sentiments(texts: list[str]) -> list[str]:
     """
     if not all([isinstance(text, str) for text in texts]):
         raise ValueError("All texts must be strings.")
-    emb = load_embeddings()
-    embs = await emb.aembed_documents(texts)
-    X = np.vstack(embs).astype("float32")
-    return list(probs_to_labels(clf.predict_proba(X), clf.classes_))
+    X = await embed_texts(texts)
+    if _CLASSIFIER is None or len(texts) >= SENTIMENT_THREAD_MIN_TEXTS:
+        # Загрузка модели и инференс на больших массивах не блокируют event loop
+        return await asyncio.to_thread(predict_labels, X)
+    return predict_labels(X)
 
 
 async def get_embeddings(texts: list[str]) -> list[list[float]]:
@@ -50,6 +106,4 @@ async def get_embeddings(texts: list[str]) -> list[list[float]]:
     """
     if not all([isinstance(text, str) for text in texts]):
         raise ValueError("All texts must be strings.")
-    emb = load_embeddings()
-    embs = await emb.aembed_documents(texts)
-    return embs
+    return (await embed_texts(texts)).tolist()
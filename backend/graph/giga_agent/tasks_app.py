@@ -9,8 +9,8 @@ from pathlib import Path
 from uuid import uuid4
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.responses import HTMLResponse, Response
 from sqlmodel import SQLModel, Field, select, func
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
@@ -19,7 +19,17 @@ from sqlalchemy.orm import sessionmaker
 
 from langgraph_sdk import get_client
 
+from giga_agent.generators.image import close_image_gens, get_image_gen_metrics
 from giga_agent.utils.env import load_project_env
+from giga_agent.utils.images import (
+    HTML_IMAGE_URL,
+    HTML_IMAGE_URL_PATTERN,
+    accepted_formats,
+    inline_image,
+    select_image,
+    strip_srcset,
+    substitute,
+)
 from giga_agent.utils.llm import is_llm_image_inline
 
 from giga_agent.config import llm
@@ -133,6 +143,8 @@ async def lifespan(app: FastAPI):
     await init_db()
     yield
     # Clean up connections
+    # tasks_app работает в процессе LangGraph API: закрываем клиенты генераторов
+    await close_image_gens()
 
 
 # Запускаем инициализацию при старте
@@ -222,15 +234,65 @@ async def delete_task(task_id: str):
 
 
 @app.get("/html/{html_id}/", response_class=HTMLResponse)
-async def get_task(html_id: str):
+async def get_task(html_id: str, self_contained: bool = False):
     client = get_client()
     result = await client.store.get_item(("html",), key=html_id)
     if result:
-        return HTMLResponse(content=result["value"]["data"], status_code=200)
+        content = result["value"]["data"]
+        if self_contained:
+            content = await inline_html_images(client, content)
+        return HTMLResponse(content=content, status_code=200)
     else:
         raise HTTPException(404, "Page not found")
 
 
+async def inline_html_images(client, content: str) -> str:
+    """Встраивает изображения страницы в base64 для экспорта одним файлом."""
+    image_ids = set(HTML_IMAGE_URL_PATTERN.findall(content))
+    items = await asyncio.gather(
+        *(client.store.get_item(("images",), key=image_id) for image_id in image_ids)
+    )
+    replacements = {
+        HTML_IMAGE_URL.format(file_id=image_id): inline_image(
+            *select_image(item["value"], ["webp"])
+        )
+        for image_id, item in zip(image_ids, items)
+        if item
+    }
+    return substitute(strip_srcset(content), replacements)
+
+
+@app.get("/images/{image_id}/")
+async def get_image(image_id: str, request: Request, w: Optional[int] = None):
+    # Вариант выбирается по Accept (AVIF/WebP) и ширине показа (?w=)
+    formats = accepted_formats(request.headers.get("accept", ""))
+    # Изображения неизменяемы: id выдается один раз при генерации,
+    # поэтому ETag определяется самим запросом
+    etag = f'"{image_id}-{"-".join(formats) or "original"}-{w or ""}"'
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Vary": "Accept",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    client = get_client()
+    result = await client.store.get_item(("images",), key=image_id)
+    if not result:
+        raise HTTPException(404, "Image not found")
+    data, media_type = select_image(result["value"], formats, w)
+    return Response(
+        content=base64.b64decode(data),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+@app.get("/metrics/image_gen/")
+async def image_gen_metrics():
+    return get_image_gen_metrics()
+
+
 @app.post("/upload/image/")
 async def upload_image(file: UploadFile = File(...)):
     client = get_client()
@@ -84,6 +84,29 @@ client = JupyterClient(
     base_url=os.getenv("JUPYTER_CLIENT_API", "http://127.0.0.1:9090")
 )
 
+# Длинные списки передаются в ядро частями по столько элементов
+KERNEL_APPEND_CHUNK = int(os.getenv("KERNEL_APPEND_CHUNK", 1000))
+
+
+async def append_function_result(kernel_id: str, add_data: dict) -> None:
+    """Добавляет результат инструмента в `function_results` ядра.
+
+    Длинный список (например, тысячи комментариев) дописывается частями,
+    чтобы не собирать и не исполнять в ядре один огромный литерал.
+    """
+    data = add_data["data"]
+    if not isinstance(data, list) or len(data) <= KERNEL_APPEND_CHUNK:
+        await client.execute(kernel_id, f"function_results.append({repr(add_data)})")
+        return
+    await client.execute(
+        kernel_id, f"function_results.append({repr({**add_data, 'data': []})})"
+    )
+    for start in range(0, len(data), KERNEL_APPEND_CHUNK):
+        chunk = data[start : start + KERNEL_APPEND_CHUNK]
+        await client.execute(
+            kernel_id, f"function_results[-1]['data'].extend({repr(chunk)})"
+        )
+
 
 async def agent(state: AgentState):
     tool_client = ToolClient(
@@ -201,14 +224,22 @@ async def tool_call(
             result = json.loads(result)
         except Exception as e:
             pass
+        # Изображения страниц не нужны ни в ядре, ни во вложениях сообщения
+        images = result.pop("giga_images", []) if isinstance(result, dict) else []
+        for image in images:
+            await store.aput(
+                ("images",),
+                image["file_id"],
+                image,
+                ttl=None,
+                index=False,
+            )
         if result:
             add_data = {
                 "data": result,
                 "message": f"Результат функции сохранен в переменную `function_results[{tool_call_index}]['data']` ",
             }
-            await client.execute(
-                state.get("kernel_id"), f"function_results.append({repr(add_data)})"
-            )
+            await append_function_result(state.get("kernel_id"), add_data)
             if (
                 len(json.dumps(result, ensure_ascii=False)) > 10000 * 4
                 and action.get("name") not in AGENT_MAP
@@ -229,7 +260,10 @@ async def tool_call(
             attachments = result.pop("giga_attachments")
             file_ids = [attachment["file_id"] for attachment in attachments]
             for attachment in attachments:
-                if attachment["type"] == "text/html":
+                if "data" not in attachment:
+                    # Вложение уже сохранено агентом в хранилище
+                    pass
+                elif attachment["type"] == "text/html":
                     await store.aput(
                         ("html",),
                         attachment["file_id"],
@@ -56,7 +56,11 @@ class ToolClient(BaseModel):
             raise ToolExecuteException(str(e))
 
         if response.status_code == 200:
-            data = response.json()["data"]
+            payload = response.json()
+            # Сообщения о ходе выполнения REPL-инструмента
+            for line in payload.get("log") or []:
+                print(line)
+            data = payload["data"]
             try:
                 data = json.loads(data)
             except Exception:
@@ -10,6 +10,8 @@ from fastapi.responses import JSONResponse
 
 from giga_agent.utils.env import load_project_env
 from giga_agent.config import MCP_CONFIG, TOOLS, REPL_TOOLS, AGENT_MAP
+from giga_agent.generators.image import close_image_gens
+from giga_agent.utils.progress import collect_progress
 
 tool_map = {}
 repl_tool_map = {}
@@ -28,6 +30,7 @@ async def lifespan(app: FastAPI):
     for tool in REPL_TOOLS:
         repl_tool_map[tool.__name__] = tool
     yield
+    await close_image_gens()
     repl_tool_map.clear()
     tool_map.clear()
     config.clear()
@@ -48,7 +51,9 @@ async def call_tool(tool_name: str, payload: dict = Body(...)):
         try:
             if tool_name in repl_tool_map:
                 kwargs = payload.get("kwargs")
-                return JSONResponse({"data": await repl_tool_map[tool_name](**kwargs)})
+                with collect_progress() as log:
+                    data = await repl_tool_map[tool_name](**kwargs)
+                return JSONResponse({"data": data, "log": log})
             tool = tool_map[tool_name]
             kwargs = payload.get("kwargs")
             state = payload.get("state")
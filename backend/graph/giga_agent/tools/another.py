@@ -16,7 +16,7 @@ from pydantic import Field
 from langgraph_sdk import get_client
 
 from giga_agent.utils.llm import is_llm_image_inline, load_llm
-from giga_agent.generators.image import load_image_gen
+from giga_agent.generators.image import load_image_gen, PRIORITY_HIGH
 from giga_agent.prompts.image import IMAGE_PROMPT
 
 
@@ -216,7 +216,7 @@ async def gen_image(theme: str):
     )
     i = response["json"]["image"]
     image_data = await generator.generate_image(
-        i["description"], i["width"], i["height"]
+        i["description"], i["width"], i["height"], priority=PRIORITY_HIGH
     )
     if is_llm_image_inline():
         uploaded_file_id = (
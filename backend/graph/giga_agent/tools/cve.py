@@ -1,8 +1,29 @@
-import httpx
-from typing import Any, Dict
+import asyncio
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 from langchain_core.tools import tool
 
+from giga_agent.tools.osv_index import OSVIndex, has_version_order
+
+OSV_API_URL = "https://api.osv.dev/v1"
+OSV_DUMP_URL = os.getenv(
+    "OSV_DUMP_URL",
+    "https://osv-vulnerabilities.storage.googleapis.com/{ecosystem}/all.zip",
+)
+# Путь к локальному индексу OSV, пустое значение — только запросы к osv.dev
+OSV_DB_PATH = os.getenv("OSV_DB_PATH", "cache/osv.sqlite3")
+# Через сколько часов локальный индекс обновляется при следующем запросе
+OSV_MAX_AGE_HOURS = float(os.getenv("OSV_MAX_AGE_HOURS", 24))
+OSV_QUERYBATCH_SIZE = 1000
+
+osv_index = OSVIndex(OSV_DB_PATH)
+_SYNC_LOCKS: Dict[str, asyncio.Lock] = {}
+
 
 @tool(parse_docstring=True)
 async def get_cve_for_package(
@@ -23,3 +44,136 @@ async def get_cve_for_package(
         )
         response.raise_for_status()
         return response.json()
+
+
+def parse_requirement(line: str) -> Optional[Tuple[str, str]]:
+    """(пакет, версия) из строки вида `name==1.0`, `name===1.0`,
+    `name[extra]==1.0; marker` или `name@1.0` (npm).
+
+    None — версия не закреплена или зависимость задана ссылкой
+    (`name @ git+https://...`, PEP 508).
+    """
+    line = line.split("#", 1)[0].split(";", 1)[0].strip()
+    if "===" in line:
+        name, version = line.split("===", 1)
+    elif "==" in line:
+        name, version = line.split("==", 1)
+    elif line.rfind("@") > 0:
+        name, version = line.rsplit("@", 1)
+        # `name @ url` — ссылка, а не версия
+        if " " in name or "://" in name or "://" in version:
+            return None
+    else:
+        return None
+    name = re.sub(r"\[.*\]", "", name).strip()
+    version = version.strip()
+    if not name or not version or " " in name:
+        return None
+    return name, version
+
+
+async def sync_osv_index(ecosystem: str, force: bool = False) -> bool:
+    """Загружает дамп OSV экосистемы в локальный индекс, если он устарел.
+
+    Возвращает True, если индекс экосистемы можно использовать.
+    """
+    lock = _SYNC_LOCKS.setdefault(ecosystem, asyncio.Lock())
+    async with lock:
+        synced = await asyncio.to_thread(osv_index.synced_at, ecosystem)
+        if (
+            synced is not None
+            and not force
+            and time.time() - synced < OSV_MAX_AGE_HOURS * 3600
+        ):
+            return True
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".zip") as dump:
+                async with httpx.AsyncClient(timeout=300) as client:
+                    async with client.stream(
+                        "GET", OSV_DUMP_URL.format(ecosystem=ecosystem)
+                    ) as response:
+                        response.raise_for_status()
+                        async for chunk in response.aiter_bytes():
+                            dump.write(chunk)
+                dump.flush()
+                await asyncio.to_thread(osv_index.load_dump, ecosystem, dump.name)
+        except Exception:
+            # Обновить не удалось: используем прежние данные, если они есть
+            return synced is not None
+        return True
+
+
+async def query_osv_api(
+    ecosystem: str, packages: List[Tuple[str, str]]
+) -> List[List[dict]]:
+    """Запасной путь: пакетный запрос к osv.dev (только id уязвимостей)."""
+    results = []
+    async with httpx.AsyncClient(timeout=60) as client:
+        for start in range(0, len(packages), OSV_QUERYBATCH_SIZE):
+            batch = packages[start : start + OSV_QUERYBATCH_SIZE]
+            response = await client.post(
+                f"{OSV_API_URL}/querybatch",
+                json={
+                    "queries": [
+                        {
+                            "version": version,
+                            "package": {"name": name, "ecosystem": ecosystem},
+                        }
+                        for name, version in batch
+                    ]
+                },
+            )
+            response.raise_for_status()
+            for result in response.json()["results"]:
+                results.append(
+                    [{"id": vuln["id"]} for vuln in result.get("vulns", [])]
+                )
+    return results
+
+
+@tool(parse_docstring=True)
+async def get_cve_for_packages(
+    packages: List[str], ecosystem: str = "PyPI", refresh: bool = False
+) -> Dict[str, Any]:
+    """
+    Проверяет сразу весь список зависимостей на известные уязвимости (CVE) по базе OSV.
+    Используй для аудита requirements.txt и других списков зависимостей
+    вместо проверки пакетов по одному.
+
+    Args:
+        packages: Зависимости в формате "имя==версия" (строки requirements.txt)
+        ecosystem: Экосистема пакетов в OSV: PyPI, npm, Go, Maven, crates.io и т.д.
+        refresh: Обновить локальную базу уязвимостей перед проверкой
+    """
+    pinned = []
+    skipped = []
+    for line in packages:
+        requirement = parse_requirement(line)
+        if requirement is None:
+            if line.strip() and not line.strip().startswith(("#", "-")):
+                skipped.append(line.strip())
+            continue
+        pinned.append(requirement)
+
+    source = "local"
+    # Без локального порядка версий (Go, Maven и т.д.) диапазоны проверяет osv.dev
+    if (
+        osv_index.enabled
+        and has_version_order(ecosystem)
+        and await sync_osv_index(ecosystem, force=refresh)
+    ):
+        vulns = await asyncio.to_thread(osv_index.lookup, ecosystem, pinned)
+    else:
+        source = "osv.dev"
+        vulns = await query_osv_api(ecosystem, pinned)
+
+    results = [
+        {"package": name, "version": version, "vulnerabilities": found}
+        for (name, version), found in zip(pinned, vulns)
+    ]
+    return {
+        "source": source,
+        "vulnerable": [r for r in results if r["vulnerabilities"]],
+        "checked": len(results),
+        "skipped_without_version": skipped,
+    }
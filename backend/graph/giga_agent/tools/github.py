@@ -1,9 +1,157 @@
+import asyncio
 import httpx
 import os
-from typing import Any, Dict, Optional, Union, Literal
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union, Literal
 
 from langchain_core.tools import tool
 
+GITHUB_API_URL = "https://api.github.com"
+# Сколько ответов (по URL и параметрам) хранить для условных запросов
+GITHUB_ETAG_CACHE_SIZE = int(os.getenv("GITHUB_ETAG_CACHE_SIZE", 256))
+GITHUB_MAX_PAGES = 10
+
+# Поля, которые нужны агенту. None — значение берется целиком,
+# словарь — из вложенного объекта (или каждого элемента списка) берутся его поля
+USER_FIELDS = {"login": None}
+REF_FIELDS = {"label": None, "ref": None, "sha": None}
+WORKFLOW_RUN_FIELDS = {
+    "id": None,
+    "name": None,
+    "display_title": None,
+    "run_number": None,
+    "run_attempt": None,
+    "event": None,
+    "status": None,
+    "conclusion": None,
+    "head_branch": None,
+    "head_sha": None,
+    "path": None,
+    "html_url": None,
+    "created_at": None,
+    "updated_at": None,
+    "run_started_at": None,
+    "actor": USER_FIELDS,
+    "triggering_actor": USER_FIELDS,
+    "head_commit": {
+        "id": None,
+        "message": None,
+        "timestamp": None,
+        "author": {"name": None},
+    },
+    "pull_requests": {"number": None, "head": REF_FIELDS, "base": REF_FIELDS},
+}
+WORKFLOW_RUNS_FIELDS = {"total_count": None, "workflow_runs": WORKFLOW_RUN_FIELDS}
+PULL_REQUEST_FIELDS = {
+    "number": None,
+    "title": None,
+    "body": None,
+    "state": None,
+    "draft": None,
+    "html_url": None,
+    "user": USER_FIELDS,
+    "author_association": None,
+    "labels": {"name": None},
+    "assignees": USER_FIELDS,
+    "requested_reviewers": USER_FIELDS,
+    "head": REF_FIELDS,
+    "base": REF_FIELDS,
+    "created_at": None,
+    "updated_at": None,
+    "closed_at": None,
+    "merged_at": None,
+    "merge_commit_sha": None,
+    # Поля ниже есть только в ответе на запрос одного PR
+    "merged": None,
+    "merged_by": USER_FIELDS,
+    "mergeable": None,
+    "mergeable_state": None,
+    "comments": None,
+    "review_comments": None,
+    "commits": None,
+    "additions": None,
+    "deletions": None,
+    "changed_files": None,
+}
+
+_GITHUB_CLIENT: Optional[httpx.AsyncClient] = None
+# ключ запроса -> (ETag, ответ после project)
+_ETAG_CACHE: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """Общий для всех инструментов клиент GitHub API."""
+    global _GITHUB_CLIENT
+    if _GITHUB_CLIENT is None or _GITHUB_CLIENT.is_closed:
+        _GITHUB_CLIENT = httpx.AsyncClient(base_url=GITHUB_API_URL, timeout=30)
+    return _GITHUB_CLIENT
+
+
+def project(obj: Any, fields: Optional[Dict[str, Any]]) -> Any:
+    """Оставляет в ответе GitHub только поля из `fields` за один проход."""
+    if fields is None:
+        return obj
+    if isinstance(obj, list):
+        return [project(item, fields) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    return {
+        key: project(obj[key], sub_fields)
+        for key, sub_fields in fields.items()
+        if key in obj
+    }
+
+
+async def github_get(
+    path: str, fields: Dict[str, Any], params: Optional[Dict[str, Any]] = None
+) -> Any:
+    """GET к GitHub API с условным запросом по ETag.
+
+    Ответ 304 Not Modified не расходует лимит запросов, в этом случае
+    возвращается сохраненный результат.
+    """
+    params = params or {}
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {os.environ['GITHUB_PERSONAL_ACCESS_TOKEN']}",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    key = f"{path}?{sorted(params.items())}"
+    cached = _ETAG_CACHE.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+    response = await get_github_client().get(path, headers=headers, params=params)
+    if response.status_code == 304 and cached is not None:
+        _ETAG_CACHE.move_to_end(key)
+        return cached[1]
+    response.raise_for_status()
+    result = project(response.json(), fields)
+    etag = response.headers.get("ETag")
+    if etag and GITHUB_ETAG_CACHE_SIZE > 0:
+        _ETAG_CACHE[key] = (etag, result)
+        _ETAG_CACHE.move_to_end(key)
+        while len(_ETAG_CACHE) > GITHUB_ETAG_CACHE_SIZE:
+            _ETAG_CACHE.popitem(last=False)
+    return result
+
+
+async def github_get_pages(
+    path: str,
+    fields: Dict[str, Any],
+    params: Dict[str, Any],
+    page: int,
+    pages: int,
+) -> List[Any]:
+    """Параллельно запрашивает страницы `page`..`page + pages - 1`."""
+    if pages > GITHUB_MAX_PAGES:
+        raise Exception(f"Maximum pages value is {GITHUB_MAX_PAGES}")
+    return await asyncio.gather(
+        *(
+            github_get(path, fields, {**params, "page": page + i})
+            for i in range(max(1, pages))
+        )
+    )
+
 
 @tool(parse_docstring=True)
 async def get_workflow_runs(
@@ -32,6 +180,7 @@ async def get_workflow_runs(
     ] = None,
     per_page: int = 30,
     page: int = 1,
+    pages: int = 1,
     created: Optional[str] = None,
     exclude_pull_requests: bool = False,
 ) -> Dict[str, Any]:
@@ -47,21 +196,14 @@ async def get_workflow_runs(
         status: Filter by run status or conclusion. Can be one of: completed, action_required, cancelled, failure, neutral, skipped, stale, success, timed_out, in_progress, queued, requested, waiting, pending.
         per_page: Results per page (max 100). If you need to get more call this method in loop
         page: Page number to fetch.
+        pages: Number of consecutive pages starting from page to fetch at once (max 10).
         created: Date-time range filter (see GitHub search syntax).
         exclude_pull_requests: If True, omit pull request runs.
     """
     if per_page > 100:
         raise Exception("Maximum per_page value is 100")
-    url = f"https://api.github.com/repos/{owner}/{repo}/actions/runs"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {os.environ['GITHUB_PERSONAL_ACCESS_TOKEN']}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-
     params: Dict[str, Union[str, int, bool]] = {
         "per_page": per_page,
-        "page": page,
         "exclude_pull_requests": str(exclude_pull_requests).lower(),
     }
 
@@ -77,10 +219,19 @@ async def get_workflow_runs(
     if created:
         params["created"] = created
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return remove_url_keys(response.json())
+    results = await github_get_pages(
+        f"/repos/{owner}/{repo}/actions/runs",
+        WORKFLOW_RUNS_FIELDS,
+        params,
+        page,
+        pages,
+    )
+    return {
+        "total_count": results[0].get("total_count"),
+        "workflow_runs": [
+            run for result in results for run in result["workflow_runs"]
+        ],
+    }
 
 
 @tool(parse_docstring=True)
@@ -94,7 +245,8 @@ async def list_pull_requests(
     direction: Optional[Literal["asc", "desc"]] = None,
     per_page: int = 30,
     page: int = 1,
-) -> Dict[str, Any]:
+    pages: int = 1,
+) -> List[Dict[str, Any]]:
     """
     Список Pull Requests репозитория
     
@@ -108,17 +260,11 @@ async def list_pull_requests(
         direction: Направление сортировки: asc|desc
         per_page: Результатов на страницу (макс 100)
         page: Номер страницы
+        pages: Сколько страниц подряд, начиная с page, получить за раз (макс 10)
     """
     if per_page > 100:
         raise Exception("Maximum per_page value is 100")
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {os.environ['GITHUB_PERSONAL_ACCESS_TOKEN']}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-
-    params: Dict[str, Any] = {"per_page": per_page, "page": page}
+    params: Dict[str, Any] = {"per_page": per_page}
     if state:
         params["state"] = state
     if head:
@@ -130,10 +276,10 @@ async def list_pull_requests(
     if direction:
         params["direction"] = direction
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return remove_url_keys(response.json())
+    results = await github_get_pages(
+        f"/repos/{owner}/{repo}/pulls", PULL_REQUEST_FIELDS, params, page, pages
+    )
+    return [pull for result in results for pull in result]
 
 
 @tool(parse_docstring=True)
@@ -150,38 +296,6 @@ async def get_pull_request(
         repo: Имя репозитория (без .git)
         pull_number: Номер PR
     """
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {os.environ['GITHUB_PERSONAL_ACCESS_TOKEN']}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        response.raise_for_status()
-        return remove_url_keys(response.json())
-
-
-def remove_url_keys(obj: Any) -> Any:
-    """
-    Recursively remove keys containing '_url' from dictionaries if their value is not a dict.
-
-    Parameters:
-        obj: The input data, which can be a dict, list, or any other type.
-
-    Returns:
-        A new data structure with keys matching the criteria removed.
-    """
-    if isinstance(obj, dict):
-        result: Dict[Any, Any] = {}
-        for key, value in obj.items():
-            # Skip keys containing '_url' when value is not a dict
-            if "_url" in key and not isinstance(value, dict):
-                continue
-            result[key] = remove_url_keys(value)
-        return result
-    elif isinstance(obj, list):
-        return [remove_url_keys(item) for item in obj]
-    else:
-        return obj
+    return await github_get(
+        f"/repos/{owner}/{repo}/pulls/{pull_number}", PULL_REQUEST_FIELDS
+    )
@@ -0,0 +1,339 @@
+"""Локальный индекс уязвимостей OSV в SQLite.
+
+Дамп экосистемы (`{ecosystem}/all.zip` с osv.dev) загружается в SQLite:
+точные списки затронутых версий и диапазоны версий с индексом по
+(экосистема, пакет, начало диапазона). Версии в диапазонах хранятся
+в виде сортируемых строк (`version_key`), поэтому проверка версии —
+один индексированный запрос.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Версия формата индекса: при смене формата `version_key` индекс пересоздается
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (ecosystem TEXT PRIMARY KEY, synced REAL);
+CREATE TABLE IF NOT EXISTS vulns (
+    id TEXT PRIMARY KEY,
+    ecosystem TEXT,
+    summary TEXT,
+    aliases TEXT,
+    severity TEXT,
+    modified TEXT
+);
+CREATE TABLE IF NOT EXISTS ranges (
+    vuln_id TEXT,
+    ecosystem TEXT,
+    package TEXT,
+    introduced TEXT,
+    fixed TEXT,
+    last_affected TEXT,
+    fixed_version TEXT
+);
+CREATE INDEX IF NOT EXISTS ranges_lookup ON ranges (ecosystem, package, introduced);
+CREATE TABLE IF NOT EXISTS versions (
+    vuln_id TEXT, ecosystem TEXT, package TEXT, version TEXT
+);
+CREATE INDEX IF NOT EXISTS versions_lookup ON versions (ecosystem, package, version);
+"""
+
+_PEP440_RE = re.compile(
+    r"^v?(?:(\d+)!)?(\d+(?:\.\d+)*)"
+    r"(?:[-_.]?(a|b|c|rc|alpha|beta|pre|preview)[-_.]?(\d+)?)?"
+    r"(?:-(\d+)|[-_.]?(post|rev|r)[-_.]?(\d+)?)?"
+    r"(?:[-_.]?(dev)[-_.]?(\d+)?)?"
+    r"(?:\+[a-z0-9]+(?:[-_.][a-z0-9]+)*)?$",
+    re.IGNORECASE,
+)
+_PEP440_PRE = {"a": "1", "alpha": "1", "b": "2", "beta": "2"}
+_SEMVER_RE = re.compile(
+    r"^v?(\d+)\.(\d+)\.(\d+)"
+    r"(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?"
+    r"(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?$"
+)
+# Экосистемы с порядком версий SemVer 2.0
+_SEMVER_ECOSYSTEMS = {"npm", "crates.io", "Hex", "Pub"}
+
+def normalize_package(ecosystem: str, name: str) -> str:
+    """Имя пакета в каноничном виде (для PyPI — по PEP 503)."""
+    name = name.strip()
+    if ecosystem.lower() == "pypi":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    return name
+
+
+def _number_key(number: str) -> str:
+    """Число как сортируемая строка любой длины: длина, затем цифры."""
+    digits = number.lstrip("0") or "0"
+    return f"{len(digits):02d}{digits}"
+
+
+def _pep440_key(version: str) -> Optional[str]:
+    match = _PEP440_RE.match(version.strip())
+    if not match:
+        return None
+    epoch, release, pre, pre_n, post_implicit, post, post_n, dev, dev_n = (
+        match.groups()
+    )
+    parts = release.split(".")
+    # 1.0 == 1.0.0: незначащие нули в конце не влияют на порядок
+    while len(parts) > 1 and int(parts[-1]) == 0:
+        parts.pop()
+    has_post = post_implicit is not None or post is not None
+    # Стадия: только dev < a < b < rc < релиз (в том числе post)
+    if pre:
+        stage = _PEP440_PRE.get(pre.lower(), "3") + _number_key(pre_n or "0")
+    elif dev and not has_post:
+        stage = "0"
+    else:
+        stage = "4"
+    post_key = "1" + _number_key(post_implicit or post_n or "0") if has_post else "0"
+    dev_key = "0" + _number_key(dev_n or "0") if dev else "1"
+    release_key = ".".join(_number_key(part) for part in parts)
+    # "-" меньше ".", поэтому 1 < 1.1
+    return f"{_number_key(epoch or '0')}!{release_key}-{stage}{post_key}{dev_key}"
+
+
+def _semver_key(version: str) -> Optional[str]:
+    match = _SEMVER_RE.match(version.strip())
+    if not match:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    core = ".".join(_number_key(part) for part in (major, minor, patch))
+    if prerelease is None:
+        # "~" больше "-": релиз выше любого пре-релиза той же версии
+        return core + "~"
+    # Числовые идентификаторы ниже буквенных; "," меньше любого символа
+    # идентификатора, поэтому более короткий список идентификаторов меньше
+    identifiers = [
+        "0" + _number_key(part) if part.isdigit() else "1" + part
+        for part in prerelease.split(".")
+    ]
+    return core + "-" + ",".join(identifiers)
+
+
+def has_version_order(ecosystem: str) -> bool:
+    """Можно ли проверять версии экосистемы по диапазонам локально."""
+    return ecosystem == "PyPI" or ecosystem in _SEMVER_ECOSYSTEMS
+
+
+def version_key(ecosystem: str, version: str) -> Optional[str]:
+    """Сортируемая строка версии в порядке экосистемы.
+
+    PyPI — по PEP 440 (`1.2rc1` < `1.2` < `1.2.post1` < `1.10`), npm и
+    другие SemVer-экосистемы — по SemVer 2.0 (`1.0.0-beta.2` < `1.0.0-beta.10`).
+    None — версию не удалось разобрать или порядок экосистемы не поддержан
+    (Go, Maven и т.д.): тогда она проверяется только по точным спискам версий.
+    """
+    if ecosystem == "PyPI":
+        return _pep440_key(version)
+    if ecosystem in _SEMVER_ECOSYSTEMS:
+        return _semver_key(version)
+    return None
+
+
+def iter_ranges(events: List[dict]) -> Iterator[Tuple[str, Optional[str], str]]:
+    """Диапазоны из событий OSV: (introduced, граница, тип границы)."""
+    introduced = None
+    for event in events:
+        if "introduced" in event:
+            introduced = event["introduced"]
+        elif introduced is not None and ("fixed" in event or "last_affected" in event):
+            kind = "fixed" if "fixed" in event else "last_affected"
+            yield introduced, event[kind], kind
+            introduced = None
+    if introduced is not None:
+        yield introduced, None, "fixed"
+
+
+def vuln_severity(vuln: dict) -> Optional[str]:
+    severity = (vuln.get("database_specific") or {}).get("severity")
+    if severity:
+        return severity
+    scores = [s.get("score") for s in vuln.get("severity", []) if s.get("score")]
+    return scores[0] if scores else None
+
+
+class OSVIndex:
+    """Индекс уязвимостей одной или нескольких экосистем OSV."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version != INDEX_VERSION:
+                for table in ("meta", "vulns", "ranges", "versions"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            self._initialized = True
+        return conn
+
+    def synced_at(self, ecosystem: str) -> Optional[float]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT synced FROM meta WHERE ecosystem = ?", (ecosystem,)
+                ).fetchone()
+            finally:
+                conn.close()
+        return row[0] if row else None
+
+    def load_dump(self, ecosystem: str, dump_path: str) -> int:
+        """Заменяет данные экосистемы содержимым zip-дампа OSV.
+
+        Возвращает число загруженных уязвимостей.
+        """
+        vulns, ranges, versions = [], [], []
+        with zipfile.ZipFile(dump_path) as archive:
+            for name in archive.namelist():
+                if not name.endswith(".json"):
+                    continue
+                vuln = json.loads(archive.read(name))
+                vulns.append(
+                    (
+                        vuln["id"],
+                        ecosystem,
+                        vuln.get("summary") or (vuln.get("details") or "")[:300],
+                        json.dumps(vuln.get("aliases", [])),
+                        vuln_severity(vuln),
+                        vuln.get("modified"),
+                    )
+                )
+                for affected in vuln.get("affected", []):
+                    package = affected.get("package", {})
+                    if package.get("ecosystem", "").split(":")[0] != ecosystem:
+                        continue
+                    name_ = normalize_package(ecosystem, package.get("name", ""))
+                    for version in affected.get("versions", []):
+                        versions.append((vuln["id"], ecosystem, name_, version))
+                    for range_ in affected.get("ranges", []):
+                        if range_.get("type") == "GIT":
+                            continue
+                        for start, end, kind in iter_ranges(range_.get("events", [])):
+                            # "0" в OSV — с самой первой версии
+                            start_key = (
+                                "" if start == "0" else version_key(ecosystem, start)
+                            )
+                            end_key = version_key(ecosystem, end) if end else None
+                            if start_key is None or (end and end_key is None):
+                                continue
+                            ranges.append(
+                                (
+                                    vuln["id"],
+                                    ecosystem,
+                                    name_,
+                                    start_key,
+                                    end_key if kind == "fixed" else None,
+                                    end_key if kind == "last_affected" else None,
+                                    end if kind == "fixed" else None,
+                                )
+                            )
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    for table in ("vulns", "ranges", "versions"):
+                        conn.execute(
+                            f"DELETE FROM {table} WHERE ecosystem = ?", (ecosystem,)
+                        )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO vulns VALUES (?, ?, ?, ?, ?, ?)", vulns
+                    )
+                    conn.executemany(
+                        "INSERT INTO ranges VALUES (?, ?, ?, ?, ?, ?, ?)", ranges
+                    )
+                    conn.executemany(
+                        "INSERT INTO versions VALUES (?, ?, ?, ?)", versions
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                        (ecosystem, time.time()),
+                    )
+            finally:
+                conn.close()
+        return len(vulns)
+
+    def lookup(
+        self, ecosystem: str, packages: List[Tuple[str, str]]
+    ) -> List[List[dict]]:
+        """Уязвимости для каждой пары (пакет, версия), в порядке `packages`."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                return [
+                    self._lookup_one(conn, ecosystem, name, version)
+                    for name, version in packages
+                ]
+            finally:
+                conn.close()
+
+    def _lookup_one(
+        self, conn: sqlite3.Connection, ecosystem: str, name: str, version: str
+    ) -> List[dict]:
+        package = normalize_package(ecosystem, name)
+        fixed: Dict[str, List[str]] = {}
+        for (vuln_id,) in conn.execute(
+            "SELECT vuln_id FROM versions "
+            "WHERE ecosystem = ? AND package = ? AND version = ?",
+            (ecosystem, package, version),
+        ):
+            fixed.setdefault(vuln_id, [])
+        key = version_key(ecosystem, version)
+        if key is not None:
+            for (vuln_id,) in conn.execute(
+                "SELECT vuln_id FROM ranges "
+                "WHERE ecosystem = ? AND package = ? AND introduced <= ? "
+                "AND (fixed IS NULL OR fixed > ?) "
+                "AND (last_affected IS NULL OR last_affected >= ?)",
+                (ecosystem, package, key, key, key),
+            ):
+                fixed.setdefault(vuln_id, [])
+        if not fixed:
+            return []
+        # Версии с исправлением — из всех диапазонов найденных уязвимостей
+        ids = list(fixed)
+        marks = ",".join("?" * len(ids))
+        for vuln_id, fixed_version in conn.execute(
+            f"SELECT vuln_id, fixed_version FROM ranges "
+            f"WHERE ecosystem = ? AND package = ? AND vuln_id IN ({marks}) "
+            f"AND fixed_version IS NOT NULL",
+            (ecosystem, package, *ids),
+        ):
+            if fixed_version not in fixed[vuln_id]:
+                fixed[vuln_id].append(fixed_version)
+        result = []
+        for vuln_id, summary, aliases, severity in conn.execute(
+            f"SELECT id, summary, aliases, severity FROM vulns WHERE id IN ({marks})",
+            ids,
+        ):
+            result.append(
+                {
+                    "id": vuln_id,
+                    "aliases": json.loads(aliases),
+                    "summary": summary,
+                    "severity": severity,
+                    "fixed": fixed[vuln_id],
+                }
+            )
+        return result
@@ -1,11 +1,58 @@
+import heapq
+import json
 import os
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import httpx
 import asyncio
 from langchain_core.tools import tool
 from pydantic import Field
 
+from giga_agent.utils.concurrency import TokenBucket
+
+VK_API_URL = "https://api.vk.com/method/"
+VK_API_VERSION = "5.199"
+# Лимит VK API — 3 запроса в секунду на токен
+VK_RPS = float(os.getenv("VK_RPS", 3))
+# Больше 25 обращений к API в одном execute VK не выполняет
+VK_EXECUTE_MAX_CALLS = 25
+VK_PAGE_SIZE = 100
+VK_MAX_COMMENTS = int(os.getenv("VK_MAX_COMMENTS", 20000))
+VK_TOO_MANY_REQUESTS = 6
+VK_ATTEMPTS = 3
+
+vk_bucket = TokenBucket(VK_RPS)
+_VK_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+class VKException(Exception):
+    pass
+
+
+def get_vk_client() -> httpx.AsyncClient:
+    """Общий для всех вызовов клиент VK API."""
+    global _VK_CLIENT
+    if _VK_CLIENT is None or _VK_CLIENT.is_closed:
+        _VK_CLIENT = httpx.AsyncClient(base_url=VK_API_URL, timeout=60)
+    return _VK_CLIENT
+
+
+async def vk_request(method: str, **params) -> dict:
+    """Вызывает метод VK API в пределах лимита запросов и возвращает ответ.
+
+    При ошибке «слишком много запросов» повторяет вызов.
+    """
+    data = {**params, "access_token": os.environ["VK_TOKEN"], "v": VK_API_VERSION}
+    for attempt in range(VK_ATTEMPTS):
+        await vk_bucket.acquire()
+        response = await get_vk_client().post(method, data=data)
+        response_json = response.json()
+        error_code = response_json.get("error", {}).get("error_code")
+        if error_code != VK_TOO_MANY_REQUESTS or attempt == VK_ATTEMPTS - 1:
+            return response_json
+        await asyncio.sleep(1)
+    return response_json
+
 
 @tool
 async def vk_get_posts(
@@ -25,24 +72,15 @@ async def vk_get_posts(
         offset: Смещение, необходимое для выборки определённого подмножества записей.
         count: Количество записей, которое необходимо получить. Максимальное значение: 100.
     """
-    url = "https://api.vk.com/method/wall.get"
-    data = {
-        "domain": domain,
-        "offset": offset,
-        "count": count,
-        "access_token": os.environ["VK_TOKEN"],
-        "v": "5.199",
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers={}, data=data)
-        response_json = response.json()
-        if "response" not in response_json:
-            return response_json
-        posts = response.json()["response"]["items"]
-        for post in posts:
-            post.pop("attachments", None)
-        await asyncio.sleep(0.3)
-        return posts
+    response_json = await vk_request(
+        "wall.get", domain=domain, offset=offset, count=count
+    )
+    if "response" not in response_json:
+        return response_json
+    posts = response_json["response"]["items"]
+    for post in posts:
+        post.pop("attachments", None)
+    return posts
 
 
 @tool
@@ -59,57 +97,152 @@ async def vk_get_comments(
     ),
 ):
     """Получает комментарии к посту в ВК. Помни что тебе возвращается сразу список объектов VK Comments!"""
-    url = "https://api.vk.com/method/wall.getComments"
-    data = {
-        "owner_id": owner_id,
-        "post_id": post_id,
-        "offset": offset,
-        "count": count,
-        "access_token": os.environ["VK_TOKEN"],
-        "v": "5.199",
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers={}, data=data)
-        response_json = response.json()
-        if "response" not in response_json:
-            return response_json
-        posts = response.json()["response"]["items"]
-        for post in posts:
-            post.pop("attachments", None)
-        await asyncio.sleep(0.3)
-        return posts
+    response_json = await vk_request(
+        "wall.getComments",
+        owner_id=owner_id,
+        post_id=post_id,
+        offset=offset,
+        count=count,
+    )
+    if "response" not in response_json:
+        return response_json
+    posts = response_json["response"]["items"]
+    for post in posts:
+        post.pop("attachments", None)
+    return posts
 
 
-class VKException(Exception):
-    pass
+async def get_page_id(domain: str):
+    response_json = await vk_request("utils.resolveScreenName", screen_name=domain)
+    if "response" not in response_json:
+        raise VKException(response_json)
+    if not response_json["response"]:
+        raise VKException("Group not found")
+    page_info = response_json["response"]
+    if page_info["type"] == "user":
+        return page_info["object_id"]
+    elif page_info["type"] == "community_application":
+        return page_info["group_id"]
+    else:
+        return -page_info["object_id"]
 
 
-async def get_page_id(domain: str):
-    url = "https://api.vk.com/method/utils.resolveScreenName"
-    data = {
-        "screen_name": domain,
-        "access_token": os.environ["VK_TOKEN"],
-        "v": "5.199",
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers={}, data=data)
-        response_json = response.json()
+async def vk_execute(calls: List[Tuple[str, dict]]) -> list:
+    """Выполняет до 25 вызовов API одним запросом `execute`.
+
+    Возвращает ответы в порядке вызовов; вместо ответа упавшего вызова — False.
+    """
+    code = ",".join(
+        f"API.{method}({json.dumps(params, ensure_ascii=False)})"
+        for method, params in calls
+    )
+    response_json = await vk_request("execute", code=f"return [{code}];")
+    if "response" not in response_json:
+        raise VKException(response_json)
+    return response_json["response"]
+
+
+async def fetch_commented_posts(owner_id: int, count: int) -> List[Tuple[int, int]]:
+    """Последние посты с комментариями: [(post_id, число комментариев)].
+
+    Посты запрашиваются страницами, пока комментариев не наберется `count`.
+    """
+    posts = []
+    total = 0
+    offset = 0
+    while total < count:
+        response_json = await vk_request(
+            "wall.get", owner_id=owner_id, offset=offset, count=VK_PAGE_SIZE
+        )
         if "response" not in response_json:
             raise VKException(response_json)
-        if not response_json["response"]:
-            raise VKException("Group not found")
-        page_info = response.json()["response"]
-        if page_info["type"] == "user":
-            return page_info["object_id"]
-        elif page_info["type"] == "community_application":
-            return page_info["group_id"]
+        items = response_json["response"]["items"]
+        for post in items:
+            comments = post.get("comments", {}).get("count", 0)
+            if comments:
+                posts.append((post["id"], comments))
+                total += comments
+        offset += len(items)
+        if not items or offset >= response_json["response"]["count"]:
+            break
+    return posts
+
+
+def comments_depth(counts: List[int], count: int) -> int:
+    """Сколько первых комментариев каждого поста нужно, чтобы при обходе
+    постов по кругу набралось `count` комментариев."""
+    low, high = 0, max(counts, default=0)
+    while low < high:
+        depth = (low + high) // 2
+        if sum(min(c, depth) for c in counts) >= count:
+            high = depth
         else:
-            return -page_info["object_id"]
+            low = depth + 1
+    return low
+
+
+def ranked_comments(order: int, comments: List[dict]) -> Iterator[tuple]:
+    for position, comment in enumerate(comments):
+        yield position, order, comment
+
+
+async def harvest_comments(owner_id: int, count: int) -> List[dict]:
+    """Собирает `count` комментариев с последних постов.
+
+    Страницы комментариев запрашиваются пакетами `execute` параллельно
+    (в пределах лимита VK API), затем посты обходятся по кругу: первые
+    комментарии каждого поста, затем вторые и т.д. Повторы отбрасываются.
+    """
+    posts = await fetch_commented_posts(owner_id, count)
+    depth = comments_depth([comments for _, comments in posts], count)
+
+    calls = []
+    pages = []
+    for order, (post_id, comments) in enumerate(posts):
+        needed = min(comments, depth)
+        for offset in range(0, needed, VK_PAGE_SIZE):
+            params = {
+                "owner_id": owner_id,
+                "post_id": post_id,
+                "offset": offset,
+                "count": min(VK_PAGE_SIZE, needed - offset),
+            }
+            calls.append(("wall.getComments", params))
+            pages.append((order, post_id))
+    batches = [
+        calls[start : start + VK_EXECUTE_MAX_CALLS]
+        for start in range(0, len(calls), VK_EXECUTE_MAX_CALLS)
+    ]
+    responses = await asyncio.gather(*(vk_execute(batch) for batch in batches))
+
+    per_post: Dict[int, List[dict]] = {}
+    page_responses = (page for batch in responses for page in batch)
+    for (order, post_id), page in zip(pages, page_responses):
+        if not page:
+            continue
+        for comment in page.get("items", []):
+            comment["post_id"] = post_id
+            comment.pop("attachments", None)
+            per_post.setdefault(order, []).append(comment)
+
+    result = []
+    seen = set()
+    streams = [ranked_comments(order, items) for order, items in per_post.items()]
+    for _, _, comment in heapq.merge(*streams):
+        key = (comment["post_id"], comment["id"])
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(comment)
+        if len(result) == count:
+            break
+    return result
 
 
 @tool(parse_docstring=True)
 async def vk_get_last_comments(domain: str, count: Optional[int] = None):
-    """Получает комментарии с последних постов в ВК
+    """Получает комментарии с последних постов в ВК. Можно запросить тысячи
+    комментариев (до 20000), например, для анализа тональности сообщества.
 
     Args:
         domain: Короткий адрес пользователя или сообщества.
@@ -117,7 +250,7 @@ async def vk_get_last_comments(domain: str, count: Optional[int] = None):
     """
     if count is None:
         count = 300
-    """Получает комментарии со стены в ВК"""
+    count = min(count, VK_MAX_COMMENTS)
     if (
         domain.startswith("id")
         or domain.startswith("wall")
@@ -128,50 +261,4 @@ async def vk_get_last_comments(domain: str, count: Optional[int] = None):
             owner_id = -owner_id
     else:
         owner_id = await get_page_id(domain)
-    script = f"""
-var posts = API.wall.get({{"count": 20, "domain": "{domain}"}});
-var postIds = posts.items@.id;
-var postComments = [];
-var i = 0;
-while (i < postIds.length) {{
-    var comments = API.wall.getComments({{"owner_id": {owner_id}, "post_id": postIds[i], "count": 100}});
-    postComments.push(comments.items);
-    i = i + 1;
-}}
-return {{"comments": postComments, "ids": postIds}};
-"""
-    url = "https://api.vk.com/method/execute"
-    data = {
-        "code": script,
-        "access_token": os.environ["VK_TOKEN"],
-        "v": "5.199",
-    }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers={}, data=data)
-        response_json = response.json()
-        if "response" not in response_json:
-            raise VKException(response_json)
-        all_comments = response_json["response"]["comments"]
-        post_ids = response_json["response"]["ids"]
-
-        iters_with_ids = [
-            (iter(comments), post_id)
-            for comments, post_id in zip(all_comments, post_ids)
-        ]
-
-        result = []
-        total_comments = sum(len(lst) for lst in all_comments)
-        max_n = min(count, total_comments)
-
-        while len(result) < max_n:
-            for it, post_id in iters_with_ids:
-                try:
-                    comment = next(it)
-                    comment["post_id"] = post_id
-                    comment.pop("attachments", None)
-                    result.append(comment)
-                    if len(result) == count:
-                        break
-                except StopIteration:
-                    continue
-        return result
+    return await harvest_comments(owner_id, count)
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def make_cache_key(*parts: str) -> str:
+    """Возвращает sha256 от частей ключа."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskLRUCache:
+    """Кэш байтов на диске с ограничением по размеру и LRU-вытеснением.
+
+    Каждая запись хранится отдельным файлом `<directory>/<key[:2]>/<key>`.
+    Время последнего обращения хранится в mtime файла, поэтому порядок
+    вытеснения сохраняется между перезапусками процесса.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Optional[OrderedDict[str, int]] = None
+        self._total_bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load(self) -> None:
+        """Лениво читает содержимое директории при первом обращении."""
+        if self._entries is not None:
+            return
+        files = []
+        if self.directory.exists():
+            for path in self.directory.glob("*/*"):
+                if path.suffix == ".tmp":
+                    continue
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+        files.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in files)
+        self._total_bytes = sum(self._entries.values())
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                return None
+            path = self._path(key)
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                self._total_bytes -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._load()
+            path = self._path(key)
+            # Пишем во временный файл, чтобы другие процессы не прочитали запись частично
+            tmp_path = path.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                # Кэш необязателен: ошибка записи не должна ронять генерацию
+                tmp_path.unlink(missing_ok=True)
+                return
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, data: bytes) -> None:
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self.set, key, data)
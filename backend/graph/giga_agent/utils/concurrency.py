@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Проверяет, что ошибка означает превышение лимита запросов провайдера (429)."""
+    if "RateLimit" in type(exc).__name__:
+        return True
+    for obj in (exc, getattr(exc, "response", None)):
+        if obj is None:
+            continue
+        status = getattr(obj, "status_code", None) or getattr(obj, "status", None)
+        if status == 429:
+            return True
+    # gigachat.exceptions.ResponseError хранит код ответа в args
+    return 429 in getattr(exc, "args", ())
+
+
+class AdaptiveLimiter:
+    """Ограничитель числа одновременных запросов к провайдеру.
+
+    Лимит подстраивается по AIMD: растёт на единицу после `limit` успешных
+    запросов подряд (но не выше `max_limit`) и уменьшается вдвое при ошибке
+    превышения лимита провайдера (но не ниже `min_limit`).
+    """
+
+    def __init__(
+        self, limit: int, min_limit: int = 1, max_limit: Optional[int] = None
+    ) -> None:
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(max_limit or limit, self.min_limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, exc: Optional[BaseException] = None) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if exc is None:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            elif is_rate_limit_error(exc):
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+            self._condition.notify_all()
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.release(exc)
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: не больше `rate` запросов в секунду
+    с допустимым всплеском до `capacity` запросов."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # Лок держим во время ожидания, чтобы токены выдавались по очереди
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class PriorityLimiter:
+    """Ограничитель одновременных запросов с приоритетной очередью.
+
+    Освободившийся слот получает ожидающий с наименьшим `priority`,
+    при равных приоритетах — пришедший раньше. Если задан `bucket`,
+    каждый запрос дополнительно ждёт токен.
+    """
+
+    def __init__(self, limit: int, bucket: Optional[TokenBucket] = None) -> None:
+        self.limit = max(1, limit)
+        self.bucket = bucket
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def metrics(self) -> Dict[str, object]:
+        """Текущая загрузка: запросы в работе и глубина очереди по приоритетам."""
+        by_priority: Dict[int, int] = {}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": sum(by_priority.values()),
+            "queued_by_priority": by_priority,
+        }
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._counter), future))
+            try:
+                # Слот передаётся нам в release, in_flight уже учтён
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release_slot()
+                raise
+        if self.bucket is not None:
+            try:
+                await self.bucket.acquire()
+            except BaseException:
+                self._release_slot()
+                raise
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def release(self) -> None:
+        self._release_slot()
+
+    def slot(self, priority: int = 0) -> "_PrioritySlot":
+        """Контекстный менеджер: `async with limiter.slot(priority): ...`"""
+        return _PrioritySlot(self, priority)
+
+
+class _PrioritySlot:
+    def __init__(self, limiter: PriorityLimiter, priority: int) -> None:
+        self.limiter = limiter
+        self.priority = priority
+
+    async def __aenter__(self) -> None:
+        await self.limiter.acquire(self.priority)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.limiter.release()
@@ -0,0 +1,301 @@
+"""Эмбеддинги текстов с постоянным кэшем на диске.
+
+Кэш хранится отдельно для каждой модели эмбеддингов
+(`<EMBEDDINGS_CACHE_DIR>/<ключ модели>/`):
+
+- `vectors.f32` — матрица float32 (строка на текст), читается через memmap;
+- `hashes.bin` — sha256 текстов в порядке строк матрицы (индекс).
+
+Оба файла только дописываются, поэтому индекс восстанавливается
+при старте одним чтением `hashes.bin`.
+
+Промахи кэша отправляются в модель батчами по бюджету токенов,
+параллельно под `AdaptiveLimiter`; неудачные батчи повторяются по отдельности.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from giga_agent.utils.cache import make_cache_key
+from giga_agent.utils.concurrency import AdaptiveLimiter
+from giga_agent.utils.llm import load_embeddings
+from giga_agent.utils.progress import report_progress
+
+# Директория кэша эмбеддингов, пустое значение выключает кэш
+EMBEDDINGS_CACHE_DIR = os.getenv("EMBEDDINGS_CACHE_DIR", "cache/embeddings")
+# При превышении размера кэш модели очищается целиком
+EMBEDDINGS_CACHE_MAX_MB = int(os.getenv("EMBEDDINGS_CACHE_MAX_MB", 1024))
+
+# Бюджет токенов и максимум текстов в одном запросе к модели эмбеддингов
+EMBEDDINGS_BATCH_TOKENS = int(os.getenv("EMBEDDINGS_BATCH_TOKENS", 8000))
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", 256))
+EMBEDDINGS_PARALLEL = int(os.getenv("EMBEDDINGS_PARALLEL", 4))
+EMBEDDINGS_MAX_PARALLEL = int(os.getenv("EMBEDDINGS_MAX_PARALLEL", 8))
+EMBEDDINGS_RETRIES = int(os.getenv("EMBEDDINGS_RETRIES", 3))
+
+HASH_SIZE = 32
+# Грубая оценка без токенизатора: для русского текста ~3 символа на токен
+CHARS_PER_TOKEN = 3
+
+embeddings_limiter = AdaptiveLimiter(
+    EMBEDDINGS_PARALLEL, max_limit=EMBEDDINGS_MAX_PARALLEL
+)
+
+_EMBEDDING_CACHES: Dict[str, "EmbeddingCache"] = {}
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Кэш эмбеддингов одной модели: memmap-матрица float32 и индекс хэшей.
+
+    Писать в кэш должен один процесс (tool_server); читатели подхватывают
+    новые строки по размеру файлов. При очистке кэша в `meta.json`
+    записывается новое поколение (`generation`), и читатели сбрасывают
+    индекс, построенный по старым файлам.
+    """
+
+    def __init__(self, directory: str, model: str, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.model = model
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._generation: Optional[str] = None
+        self._dim: Optional[int] = None
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _hashes_path(self) -> Path:
+        return self.directory / "hashes.bin"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    def _read_generation(self) -> Optional[dict]:
+        try:
+            meta = json.loads(self._meta_path.read_text())
+            return {"generation": meta["generation"], "dim": meta["dim"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _reset(self) -> None:
+        self._index = {}
+        self._generation = None
+        self._dim = None
+        self._rows = 0
+        self._vectors = None
+
+    def _refresh(self) -> None:
+        """Дочитывает строки, добавленные после последнего обращения."""
+        meta = self._read_generation()
+        if meta is None:
+            self._reset()
+            return
+        if meta["generation"] != self._generation:
+            # Кэш очищен и создан заново: старые номера строк недействительны
+            self._reset()
+            self._generation = meta["generation"]
+            self._dim = meta["dim"]
+        try:
+            hashes_size = self._hashes_path.stat().st_size
+            vectors_size = self._vectors_path.stat().st_size
+        except OSError:
+            return
+        # Запись могла оборваться: учитываем только полные строки в обоих файлах
+        rows = min(hashes_size // HASH_SIZE, vectors_size // (4 * self._dim))
+        if rows <= self._rows:
+            return
+        with open(self._hashes_path, "rb") as f:
+            f.seek(self._rows * HASH_SIZE)
+            data = f.read((rows - self._rows) * HASH_SIZE)
+        vectors = np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)
+        )
+        # Файлы могли пересоздать, пока мы их читали
+        if (self._read_generation() or {}).get("generation") != self._generation:
+            self._reset()
+            return
+        for row in range(self._rows, rows):
+            offset = (row - self._rows) * HASH_SIZE
+            self._index.setdefault(data[offset : offset + HASH_SIZE], row)
+        self._rows = rows
+        self._vectors = vectors
+
+    def _clear(self) -> None:
+        for path in (self._vectors_path, self._hashes_path, self._meta_path):
+            path.unlink(missing_ok=True)
+        self._reset()
+
+    def get(self, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Найденные в кэше векторы по хэшам текстов."""
+        with self._lock:
+            self._refresh()
+            if self._vectors is None:
+                return {}
+            return {
+                h: np.asarray(self._vectors[self._index[h]])
+                for h in hashes
+                if h in self._index
+            }
+
+    def add(self, hashes: List[bytes], vectors: np.ndarray) -> None:
+        """Дописывает векторы (матрица n × dim) в кэш."""
+        if not len(hashes):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._refresh()
+                if self._dim is not None and self._dim != vectors.shape[1]:
+                    # Под тем же именем теперь другая модель
+                    self._clear()
+                row_size = 4 * vectors.shape[1] + HASH_SIZE
+                if (self._rows + len(hashes)) * row_size > self.max_bytes:
+                    self._clear()
+                if self._generation is None:
+                    self._start_generation(vectors.shape[1])
+                # Сначала векторы: строка без хэша просто не попадет в индекс
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                with open(self._hashes_path, "ab") as f:
+                    f.write(b"".join(hashes))
+                self._refresh()
+            except OSError:
+                # Кэш необязателен: ошибка записи не должна ронять анализ
+                return
+
+    def _start_generation(self, dim: int) -> None:
+        """Начинает новое поколение кэша с пустыми файлами."""
+        for path in (self._vectors_path, self._hashes_path):
+            path.unlink(missing_ok=True)
+        generation = uuid.uuid4().hex
+        tmp_path = self._meta_path.with_name(f"meta.{generation}.tmp")
+        tmp_path.write_text(
+            json.dumps({"model": self.model, "dim": dim, "generation": generation})
+        )
+        os.replace(tmp_path, self._meta_path)
+        self._reset()
+        self._generation = generation
+        self._dim = dim
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Кэш текущей модели эмбеддингов (GIGA_AGENT_EMBEDDINGS)."""
+    if not EMBEDDINGS_CACHE_DIR or EMBEDDINGS_CACHE_MAX_MB <= 0:
+        return None
+    model = os.getenv("GIGA_AGENT_EMBEDDINGS", "")
+    if model not in _EMBEDDING_CACHES:
+        _EMBEDDING_CACHES[model] = EmbeddingCache(
+            os.path.join(EMBEDDINGS_CACHE_DIR, make_cache_key(model)[:16]),
+            model,
+            EMBEDDINGS_CACHE_MAX_MB * 1024 * 1024,
+        )
+    return _EMBEDDING_CACHES[model]
+
+
+def split_batches(
+    texts: List[str],
+    max_tokens: int = EMBEDDINGS_BATCH_TOKENS,
+    max_size: int = EMBEDDINGS_BATCH_SIZE,
+) -> List[Tuple[int, int]]:
+    """Границы батчей `[start, end)`: не больше `max_size` текстов и
+    `max_tokens` токенов (текст длиннее бюджета идет отдельным батчем)."""
+    batches = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        text_tokens = len(text) // CHARS_PER_TOKEN + 1
+        if i > start and (tokens + text_tokens > max_tokens or i - start >= max_size):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+async def embed_batch(texts: List[str]) -> np.ndarray:
+    """Эмбеддинги одного батча с повторами при ошибках провайдера."""
+    embeddings = load_embeddings()
+    for attempt in range(EMBEDDINGS_RETRIES + 1):
+        try:
+            async with embeddings_limiter:
+                embs = await embeddings.aembed_documents(texts)
+            return np.asarray(embs, dtype=np.float32)
+        except Exception:
+            if attempt == EMBEDDINGS_RETRIES:
+                raise
+            await asyncio.sleep(2**attempt)
+
+
+async def embed_batches(texts: List[str]) -> np.ndarray:
+    """Эмбеддинги списка текстов батчами, параллельно.
+
+    Векторы пишутся сразу в заранее выделенную матрицу float32; размерность
+    берется из первого батча. О ходе выполнения сообщает `report_progress`.
+    """
+    batches = split_batches(texts)
+    first_start, first_end = batches[0]
+    first = await embed_batch(texts[first_start:first_end])
+    out = np.empty((len(texts), first.shape[1]), dtype=np.float32)
+    out[first_start:first_end] = first
+    done = 1
+
+    async def run(start: int, end: int) -> None:
+        nonlocal done
+        out[start:end] = await embed_batch(texts[start:end])
+        done += 1
+        # Не чаще, чем раз в 10% батчей
+        if done * 10 // len(batches) != (done - 1) * 10 // len(batches):
+            report_progress(f"Эмбеддинги: {done}/{len(batches)} батчей")
+
+    await asyncio.gather(*(run(start, end) for start, end in batches[1:]))
+    return out
+
+
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """Матрица эмбеддингов float32 (строка на текст, в порядке `texts`).
+
+    Дубликаты считаются один раз, в модель отправляются только тексты,
+    которых нет в кэше.
+    """
+    hashes = [text_hash(text) for text in texts]
+    unique = dict(zip(hashes, texts))
+    cache = get_embedding_cache()
+    found = {}
+    if cache is not None:
+        found = await asyncio.to_thread(cache.get, list(unique))
+    missing = [h for h in unique if h not in found]
+    if missing:
+        if found:
+            report_progress(
+                f"Эмбеддинги: из кэша {len(found)}, новых текстов {len(missing)}"
+            )
+        vectors = await embed_batches([unique[h] for h in missing])
+        if cache is not None:
+            await asyncio.to_thread(cache.add, missing, vectors)
+        found.update(zip(missing, vectors))
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    dim = len(next(iter(found.values())))
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for row, h in enumerate(hashes):
+        out[row] = found[h]
+    return out
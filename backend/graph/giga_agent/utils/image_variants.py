@@ -0,0 +1,97 @@
+"""Оптимизированные варианты сгенерированных изображений.
+
+Функции модуля выполняются в пуле процессов (см. `giga_agent.utils.workers`),
+поэтому модуль импортирует только PIL.
+"""
+
+import base64
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image, features
+
+# Ширины для адаптивной верстки, помимо целевой ширины и ее 2x
+RESPONSIVE_WIDTHS = (480, 960)
+VARIANT_QUALITY = 80
+
+MIME_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def variant_formats() -> List[str]:
+    formats = ["webp"]
+    # AVIF есть в Pillow >= 11.2, если он собран с libavif
+    if features.check("avif"):
+        formats.append("avif")
+    return formats
+
+
+def target_widths(original_width: int, width: Optional[int]) -> List[int]:
+    """Ширины вариантов: целевая, 2x для HiDPI и адаптивные, не больше исходной."""
+    widths = set(RESPONSIVE_WIDTHS)
+    if width:
+        widths.update((width, width * 2))
+    return sorted(w for w in widths if w <= original_width) or [original_width]
+
+
+def make_variants(data: str, width: Optional[int] = None) -> Tuple[List[dict], dict]:
+    """Строит WebP/AVIF варианты изображения (base64) в нескольких ширинах.
+
+    `width` — ширина, в которой изображение показывается на странице.
+    Возвращает варианты `{"format", "type", "width", "height", "data"}` и
+    статистику по размерам; исходное изображение не меняется.
+    """
+    original = base64.b64decode(data)
+    image = Image.open(BytesIO(original))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    variants = []
+    for variant_width in target_widths(image.width, width):
+        variant_height = max(1, round(image.height * variant_width / image.width))
+        resized = image
+        if variant_width != image.width:
+            resized = image.resize(
+                (variant_width, variant_height), Image.Resampling.LANCZOS
+            )
+        for fmt in variant_formats():
+            out = BytesIO()
+            resized.save(out, format=fmt.upper(), quality=VARIANT_QUALITY)
+            encoded = out.getvalue()
+            variants.append(
+                {
+                    "format": fmt,
+                    "type": MIME_TYPES[fmt],
+                    "width": variant_width,
+                    "height": variant_height,
+                    "data": base64.b64encode(encoded).decode("ascii"),
+                    "bytes": len(encoded),
+                }
+            )
+
+    # Экономия считается для варианта, который получит браузер без AVIF
+    target = pick_variant(variants, ["webp"], width)
+    target_bytes = target["bytes"] if target else len(original)
+    stats = {
+        "original_bytes": len(original),
+        "target_bytes": target_bytes,
+        "saved_bytes": len(original) - target_bytes,
+    }
+    return variants, stats
+
+
+def pick_variant(
+    variants: List[dict], formats: List[str], width: Optional[int]
+) -> Optional[dict]:
+    """Выбирает вариант первого доступного формата из `formats`:
+    наименьший не уже `width`, иначе самый широкий."""
+    for fmt in formats:
+        candidates = [v for v in variants if v["format"] == fmt]
+        if not candidates:
+            continue
+        if width:
+            wide_enough = [v for v in candidates if v["width"] >= width]
+            if wide_enough:
+                return min(wide_enough, key=lambda v: v["width"])
+        return max(candidates, key=lambda v: v["width"])
+    return None
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import re
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from giga_agent.utils.image_variants import MIME_TYPES, make_variants, pick_variant
+from giga_agent.utils.workers import run_in_process
+
+# url — изображения отдаются эндпоинтом /images/{id}/ tasks_app,
+# inline — изображения встраиваются в HTML в base64 (самодостаточный файл)
+HTML_IMAGES_MODE = os.getenv("HTML_IMAGES_MODE", "url")
+# Путь относительно страницы /html/{id}/, поэтому работает за любым префиксом
+HTML_IMAGE_URL = os.getenv("HTML_IMAGE_URL", "../../images/{file_id}/")
+HTML_IMAGE_URL_PATTERN = re.compile(
+    re.escape(HTML_IMAGE_URL).replace(re.escape("{file_id}"), r"([0-9a-f\-]{36})")
+)
+IMG_TAG_PATTERN = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+IMG_SRC_PATTERN = re.compile(r"""\ssrc\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+# Атрибуты, которые добавляет add_srcset (убираются при экспорте одним файлом)
+SRCSET_ATTRS_PATTERN = re.compile(r' srcset="([^"]*)" sizes="[^"]*"')
+
+
+def substitute(text: str, replacements: Dict[str, str]) -> str:
+    """Заменяет все ключи `replacements` в тексте за один проход."""
+    if not replacements:
+        return text
+    # Длинные ключи первыми: при общем префиксе побеждает более длинное имя
+    pattern = re.compile(
+        "|".join(re.escape(key) for key in sorted(replacements, key=len, reverse=True))
+    )
+    return pattern.sub(lambda m: replacements[m.group(0)], text)
+
+
+def image_srcset(url: str, variants: List[dict], width: Optional[int]) -> str:
+    """Атрибуты `srcset`/`sizes` со ссылками на варианты ширин (`?w=`).
+
+    Формат (AVIF/WebP) эндпоинт выбирает по Accept, поэтому в `srcset`
+    только ширины.
+    """
+    widths = sorted({v["width"] for v in variants})
+    srcset = ", ".join(f"{url}?w={w} {w}w" for w in widths)
+    sizes = f"(max-width: {width}px) 100vw, {width}px" if width else "100vw"
+    return f' srcset="{srcset}" sizes="{sizes}"'
+
+
+def add_srcset(html: str, srcsets: Dict[str, str]) -> str:
+    """Добавляет `srcset` тегам `<img>`, у которых `src` — ключ `srcsets`."""
+
+    def replace(match: re.Match) -> str:
+        tag = match.group(0)
+        src = IMG_SRC_PATTERN.search(tag)
+        if not src or src.group(1) not in srcsets or "srcset" in tag.lower():
+            return tag
+        end = len(tag) - 2 if tag.endswith("/>") else len(tag) - 1
+        return tag[:end].rstrip() + srcsets[src.group(1)] + tag[end:]
+
+    return IMG_TAG_PATTERN.sub(replace, html)
+
+
+def strip_srcset(html: str) -> str:
+    """Убирает `srcset`, добавленные `add_srcset` (для встраивания в base64)."""
+    return SRCSET_ATTRS_PATTERN.sub(
+        lambda m: "" if HTML_IMAGE_URL_PATTERN.search(m.group(1)) else m.group(0),
+        html,
+    )
+
+
+def inline_image(data: str, mime_type: str = "image/jpeg") -> str:
+    return f"data:{mime_type};base64, {data}"
+
+
+def accepted_formats(accept: str) -> List[str]:
+    """Форматы вариантов, которые принимает браузер, в порядке предпочтения."""
+    return [fmt for fmt in ("avif", "webp") if MIME_TYPES[fmt] in accept]
+
+
+def select_image(
+    value: dict, formats: List[str], width: Optional[int] = None
+) -> Tuple[str, str]:
+    """Возвращает (base64, mime) подходящего варианта изображения из хранилища
+    или оригинал, если подходящего варианта нет."""
+    variants = value.get("variants", [])
+    variant = pick_variant(variants, formats, width or value.get("width"))
+    if variant:
+        return variant["data"], variant["type"]
+    return value["data"], value["type"]
+
+
+async def optimize_image(data: str, width: Optional[int] = None) -> dict:
+    """Строит оптимизированные варианты изображения в пуле процессов.
+
+    Возвращает `{"variants": [...], "stats": {...}}`; если изображение не
+    удалось обработать, вариантов нет и страница использует оригинал.
+    """
+    try:
+        variants, stats = await run_in_process(make_variants, data, width)
+    except Exception:
+        return {"variants": [], "stats": {}}
+    return {"variants": variants, "stats": stats}
+
+
+async def embed_images(
+    html: str,
+    images_base_64: Dict[str, str],
+    widths: Optional[Dict[str, int]] = None,
+    mode: str = HTML_IMAGES_MODE,
+) -> Tuple[str, List[dict]]:
+    """Подставляет изображения в сгенерированный HTML.
+
+    `widths` — ширина показа изображения на странице по его имени (из плана).
+    Для каждого изображения строятся WebP/AVIF варианты нужных размеров.
+
+    В режиме `url` тегам `<img>` добавляется `srcset` с вариантами ширин.
+    Возвращает HTML и список изображений для сохранения в хранилище
+    (ключ `giga_images` результата инструмента). В режиме `inline`
+    в base64 встраивается WebP целевой ширины, а список пустой.
+    """
+    widths = widths or {}
+    names = list(images_base_64)
+    optimized = await asyncio.gather(
+        *(optimize_image(images_base_64[name], widths.get(name)) for name in names)
+    )
+    if mode == "inline":
+        replacements = {}
+        for name, result in zip(names, optimized):
+            variant = pick_variant(result["variants"], ["webp"], widths.get(name))
+            if variant:
+                replacements[name] = inline_image(variant["data"], variant["type"])
+            else:
+                replacements[name] = inline_image(images_base_64[name])
+        return substitute(html, replacements), []
+    replacements = {}
+    srcsets = {}
+    images = []
+    for name, result in zip(names, optimized):
+        file_id = str(uuid.uuid4())
+        url = HTML_IMAGE_URL.format(file_id=file_id)
+        replacements[name] = url
+        if result["variants"]:
+            srcsets[url] = image_srcset(url, result["variants"], widths.get(name))
+        images.append(
+            {
+                "type": "image/jpeg",
+                "file_id": file_id,
+                "data": images_base_64[name],
+                "width": widths.get(name),
+                **result,
+            }
+        )
+    return add_srcset(substitute(html, replacements), srcsets), images
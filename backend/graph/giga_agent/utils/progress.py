@@ -0,0 +1,31 @@
+"""Сообщения о ходе долгих REPL-инструментов.
+
+tool_server собирает сообщения, отправленные во время вызова, и возвращает
+их вместе с результатом (ключ `log`); ToolClient в ядре печатает их,
+поэтому агент видит их в выводе ячейки.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+_PROGRESS_LOG: ContextVar[Optional[List[str]]] = ContextVar(
+    "progress_log", default=None
+)
+
+
+def report_progress(message: str) -> None:
+    """Добавляет сообщение в лог текущего вызова инструмента (если он собирается)."""
+    log = _PROGRESS_LOG.get()
+    if log is not None:
+        log.append(message)
+
+
+@contextmanager
+def collect_progress() -> Iterator[List[str]]:
+    log: List[str] = []
+    token = _PROGRESS_LOG.set(log)
+    try:
+        yield log
+    finally:
+        _PROGRESS_LOG.reset(token)
@@ -0,0 +1,120 @@
+"""Запуск субагентов из инструментов основного агента.
+
+По умолчанию граф субагента выполняется в текущем процессе, без HTTP,
+отдельного треда и (в эфемерном режиме) без записи чекпоинтов.
+Режим `remote` запускает субагента через LangGraph API, как отдельный ран.
+"""
+
+import os
+from typing import Any, AsyncIterator, Callable, NamedTuple, Optional, Sequence
+
+from langchain_core.runnables import Runnable, RunnableBinding
+from langgraph.graph.ui import push_ui_message
+from langgraph_sdk import get_client
+
+from giga_agent.utils.env import load_project_env
+
+load_project_env()
+
+# local — граф выполняется в процессе, remote — через LangGraph API
+SUBAGENTS_MODE = os.getenv("SUBAGENTS_MODE", "local")
+# Локальные запуски без чекпоинтов; иначе чекпоинты пишутся в тред родителя
+SUBAGENTS_EPHEMERAL = os.getenv("SUBAGENTS_EPHEMERAL", "1") == "1"
+LANGGRAPH_API_URL = os.getenv("LANGGRAPH_API_URL", "http://0.0.0.0:2024")
+
+_EPHEMERAL_GRAPHS = {}
+
+
+class SubagentChunk(NamedTuple):
+    """Событие стрима субагента, как `chunk` из `client.runs.stream`."""
+
+    event: str
+    data: Any
+
+
+def ephemeral_graph(assistant_id: str, graph: Runnable) -> Runnable:
+    """Копия скомпилированного графа, которая никогда не пишет чекпоинты."""
+    if assistant_id not in _EPHEMERAL_GRAPHS:
+        if isinstance(graph, RunnableBinding):
+            # Например, граф с .with_config({"recursion_limit": ...})
+            copy = graph.bound.copy(update={"checkpointer": False})
+            copy = copy.with_config(graph.config)
+        else:
+            copy = graph.copy(update={"checkpointer": False})
+        _EPHEMERAL_GRAPHS[assistant_id] = copy
+    return _EPHEMERAL_GRAPHS[assistant_id]
+
+
+async def stream_subagent(
+    assistant_id: str,
+    graph: Runnable,
+    input: dict,
+    stream_mode: Sequence[str] = ("values", "updates"),
+    config: Optional[dict] = None,
+    mode: str = SUBAGENTS_MODE,
+    ephemeral: bool = SUBAGENTS_EPHEMERAL,
+) -> AsyncIterator[SubagentChunk]:
+    """Стримит ран субагента.
+
+    `assistant_id` — имя графа в langgraph.json (для режима `remote`),
+    `graph` — тот же скомпилированный граф для запуска в процессе.
+    """
+    config = config or {}
+    if mode == "remote":
+        client = get_client(url=LANGGRAPH_API_URL)
+        thread = await client.threads.create()
+        thread_id = thread["thread_id"]
+        configurable = {**config.get("configurable", {}), "thread_id": thread_id}
+        async for chunk in client.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            input=input,
+            stream_mode=list(stream_mode),
+            on_disconnect="cancel",
+            config={**config, "configurable": configurable},
+        ):
+            yield SubagentChunk(chunk.event, chunk.data)
+        return
+
+    if ephemeral:
+        graph = ephemeral_graph(assistant_id, graph)
+    # Конфиг родительского рана (callbacks, store) наследуется из контекста
+    async for event, data in graph.astream(
+        input, config, stream_mode=list(stream_mode)
+    ):
+        yield SubagentChunk(event, data)
+
+
+async def run_subagent(
+    agent: str,
+    assistant_id: str,
+    graph: Runnable,
+    input: dict,
+    config: Optional[dict] = None,
+    on_custom: Optional[Callable[[Any], None]] = None,
+    mode: str = SUBAGENTS_MODE,
+) -> dict:
+    """Выполняет субагента, отправляя прогресс по узлам в UI
+    (`agent_execution`), и возвращает его итоговое состояние.
+
+    `on_custom` получает события `custom` стрима субагента.
+    Графы, которых нет в langgraph.json, запускаются с `mode="local"`.
+    """
+    push_ui_message("agent_execution", {"agent": agent, "node": "__start__"})
+    stream_mode = ["values", "updates"]
+    if on_custom is not None:
+        stream_mode.append("custom")
+    state = {}
+    async for chunk in stream_subagent(
+        assistant_id, graph, input, stream_mode, config, mode
+    ):
+        if chunk.event == "values":
+            state = chunk.data
+        elif chunk.event == "custom":
+            on_custom(chunk.data)
+        elif chunk.event == "updates":
+            push_ui_message(
+                "agent_execution",
+                {"agent": agent, "node": list(chunk.data.keys())[0]},
+            )
+    return state
@@ -0,0 +1,46 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Число процессов для CPU-задач (рендер мемов, обработка изображений)
+PROCESS_WORKERS = int(
+    os.getenv("GIGA_AGENT_PROCESS_WORKERS", min(4, os.cpu_count() or 1))
+)
+
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Общий для процесса пул воркеров, создается при первом обращении."""
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        # spawn: форк процесса с работающим event loop и потоками небезопасен
+        _PROCESS_POOL = ProcessPoolExecutor(
+            max_workers=PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _PROCESS_POOL
+
+
+async def run_in_process(func: Callable[..., T], *args, **kwargs) -> T:
+    """Выполняет `func` в пуле процессов, не блокируя event loop.
+
+    `func` и аргументы должны сериализоваться pickle: функция должна быть
+    объявлена на уровне модуля, который не тянет тяжелых импортов.
+    """
+    global _PROCESS_POOL
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            get_process_pool(), partial(func, *args, **kwargs)
+        )
+    except BrokenProcessPool:
+        # Воркер упал (например, OOM) — следующий вызов создаст новый пул
+        _PROCESS_POOL = None
+        raise
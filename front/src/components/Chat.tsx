@@ -70,9 +70,15 @@ const Chat: React.FC = () => {
     );
     if (uis.length) {
       // @ts-ignore
-      const agent = PROGRESS_AGENTS[uis.at(-1).props.agent];
+      const props = uis.at(-1).props;
+      // @ts-ignore
+      const agent = PROGRESS_AGENTS[props.agent];
       if (agent) {
-        return agent[uis.at(-1).props.node];
+        const label = agent[props.node];
+        if (label && props.total) {
+          return `${label} (${props.done}/${props.total})`;
+        }
+        return label;
       }
       return null;
     }
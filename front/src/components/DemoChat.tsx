@@ -88,9 +88,15 @@ const DemoChat = ({ onContinue }: DemoChatProps) => {
     );
     if (uis.length) {
       // @ts-ignore
-      const agent = PROGRESS_AGENTS[uis[0].props.agent];
+      const props = uis[0].props;
+      // @ts-ignore
+      const agent = PROGRESS_AGENTS[props.agent];
       if (agent) {
-        return agent[uis[0].props.node];
+        const label = agent[props.node];
+        if (label && props.total) {
+          return `${label} (${props.done}/${props.total})`;
+        }
+        return label;
       }
       return null;
     }
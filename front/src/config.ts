@@ -13,6 +13,7 @@ export const TOOL_MAP = {
   vk_get_last_comments: "Получение последних комментариев (ВК)",
   get_workflow_runs: "Получение CI Runs (GitHub)",
   get_cve_for_package: "Получение CVE для пакета",
+  get_cve_for_packages: "Проверка зависимостей на CVE",
   get_pull_request: "Получение PR (GitHub)",
   list_pull_requests: "Получение списка PR (GitHub)",
   weather: "Получение погоды",
@@ -39,7 +40,8 @@ export const PROGRESS_AGENTS = {
     "7_cost_structure": "Определяет затраты",
     "8_key_metrics": "Определяет ключевые метрики",
     "9_unfair_advantage": "Находит преимущество",
-    get_feedback: "Находит преимущество",
+    "10_consistency": "Согласует разделы",
+    get_feedback: "Согласует разделы",
   },
   create_landing: {
     plan: "Создание плана страницы",
@@ -55,8 +57,8 @@ export const PROGRESS_AGENTS = {
   },
   generate_presentation: {
     __start__: "Создание плана",
-    plan_node: "Генерация изображений",
-    image: "Генерация слайдов",
+    plan_node: "Подбор изображений",
+    image: "Генерация изображений и слайдов",
     slides_node: "Генерация слайдов",
   },
   create_meme: {
@@ -68,7 +70,8 @@ export const PROGRESS_AGENTS = {
     __start__: "Поиск достопримечательностей",
     attractions_node: "Поиск отелей",
     hotels_node: "Поиск лучших ресторанов / кафе",
-    food_node: "Поиск лучших ресторанов / кафе",
+    food_node: "Поиск контактов и описаний мест",
+    enrich_node: "Поиск контактов и описаний мест",
   },
   researcher_agent: {
     __start__: "Начинает исследование",